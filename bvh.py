@@ -0,0 +1,465 @@
+import argparse
+import math
+import random
+import time
+
+
+# -----------------------------------------------------------
+# Bounding Volume Hierarchy
+# -----------------------------------------------------------
+# Boxes are world-space AABBs, as in navmesh.py:
+# (min_x, min_y, min_z, max_x, max_y, max_z).
+
+LEAF_SIZE = 4
+_EPSILON = 1e-9
+
+
+def _ray_box(box, ox, oy, oz, ix, iy, iz, max_t):
+    """
+    Slab test of a ray (origin, inverse direction) against a box. Returns
+    (distance, axis of the face hit, inside) or None. Like Panda's
+    collision rays, a ray starting inside the box hits the face where it
+    leaves it.
+    """
+    t0 = (box[0] - ox) * ix
+    t1 = (box[3] - ox) * ix
+    if t0 > t1:
+        t0, t1 = t1, t0
+    near, far, near_axis, far_axis = t0, t1, 0, 0
+
+    t0 = (box[1] - oy) * iy
+    t1 = (box[4] - oy) * iy
+    if t0 > t1:
+        t0, t1 = t1, t0
+    if t0 > near:
+        near, near_axis = t0, 1
+    if t1 < far:
+        far, far_axis = t1, 1
+
+    t0 = (box[2] - oz) * iz
+    t1 = (box[5] - oz) * iz
+    if t0 > t1:
+        t0, t1 = t1, t0
+    if t0 > near:
+        near, near_axis = t0, 2
+    if t1 < far:
+        far, far_axis = t1, 2
+
+    if near > far or far < 0:
+        return None
+    if near < 0:
+        return (far, far_axis, True) if far <= max_t else None
+    return (near, near_axis, False) if near <= max_t else None
+
+
+def _ray_node(box, ox, oy, oz, ix, iy, iz, max_t):
+    """Distance at which the ray enters a node's box (0 if it starts inside), or None."""
+    t0 = (box[0] - ox) * ix
+    t1 = (box[3] - ox) * ix
+    near, far = (t0, t1) if t0 < t1 else (t1, t0)
+    t0 = (box[1] - oy) * iy
+    t1 = (box[4] - oy) * iy
+    if t0 > t1:
+        t0, t1 = t1, t0
+    near, far = max(near, t0), min(far, t1)
+    t0 = (box[2] - oz) * iz
+    t1 = (box[5] - oz) * iz
+    if t0 > t1:
+        t0, t1 = t1, t0
+    near, far = max(near, t0, 0.0), min(far, t1)
+    return near if near <= far and near <= max_t else None
+
+
+def _inverse(d):
+    return 1 / d if abs(d) > _EPSILON else math.copysign(1 / _EPSILON, d or 1.0)
+
+
+def _union(boxes):
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes), min(b[2] for b in boxes),
+            max(b[3] for b in boxes), max(b[4] for b in boxes), max(b[5] for b in boxes))
+
+
+class BVH:
+    """
+    Flattened bounding volume hierarchy over a list of boxes. Nodes are
+    stored in parallel lists; a leaf covers order[start:start + count],
+    an inner node has count 0 and its children at left[node], right[node].
+
+    The topology is fixed once built. refit() recomputes the node boxes
+    bottom-up after items have moved, which is much cheaper than a
+    rebuild as long as the items keep roughly their relative layout
+    (e.g. the parts of a moving train).
+    """
+    def __init__(self, boxes):
+        self.boxes = list(boxes)
+        self.order = list(range(len(self.boxes)))
+        self.node_boxes = []
+        self.left = []
+        self.right = []
+        self.start = []
+        self.count = []
+        if self.boxes:
+            self._build(0, len(self.boxes))
+
+    def _build(self, start, end):
+        node = len(self.node_boxes)
+        items = self.order[start:end]
+        self.node_boxes.append(_union([self.boxes[i] for i in items]))
+        self.left.append(-1)
+        self.right.append(-1)
+        self.start.append(start)
+        self.count.append(end - start)
+        if end - start <= LEAF_SIZE:
+            return node
+
+        # Median split on the longest axis of the centroid bounds
+        centroids = {i: ((self.boxes[i][0] + self.boxes[i][3]) * 0.5,
+                         (self.boxes[i][1] + self.boxes[i][4]) * 0.5,
+                         (self.boxes[i][2] + self.boxes[i][5]) * 0.5) for i in items}
+        spans = [max(c[a] for c in centroids.values()) - min(c[a] for c in centroids.values()) for a in range(3)]
+        axis = spans.index(max(spans))
+        items.sort(key=lambda i: centroids[i][axis])
+        self.order[start:end] = items
+
+        middle = (start + end) // 2
+        self.count[node] = 0
+        self.left[node] = self._build(start, middle)
+        self.right[node] = self._build(middle, end)
+        return node
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def refit(self):
+        # Children are always created after their parent, so walking the
+        # nodes backwards visits every child before its parent
+        node_boxes, boxes, order = self.node_boxes, self.boxes, self.order
+        for node in range(len(node_boxes) - 1, -1, -1):
+            count = self.count[node]
+            if count:
+                start = self.start[node]
+                node_boxes[node] = _union([boxes[i] for i in order[start:start + count]])
+            else:
+                a, b = node_boxes[self.left[node]], node_boxes[self.right[node]]
+                node_boxes[node] = (min(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]),
+                                    max(a[3], b[3]), max(a[4], b[4]), max(a[5], b[5]))
+
+    def intersect(self, origin, direction, max_t, accept=None, any_hit=False):
+        """
+        Closest box hit by the ray within max_t, as (distance, item, axis,
+        inside), or None. direction must be normalized. accept(item) can reject
+        items; any_hit stops at the first accepted hit (line of sight).
+        """
+        if not self.node_boxes:
+            return None
+        ox, oy, oz = origin
+        ix, iy, iz = _inverse(direction[0]), _inverse(direction[1]), _inverse(direction[2])
+        node_boxes, boxes, order = self.node_boxes, self.boxes, self.order
+        left, right, starts, counts = self.left, self.right, self.start, self.count
+
+        best = None
+        best_t = max_t
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if _ray_node(node_boxes[node], ox, oy, oz, ix, iy, iz, best_t) is None:
+                continue
+            count = counts[node]
+            if count:
+                start = starts[node]
+                for item in order[start:start + count]:
+                    hit = _ray_box(boxes[item], ox, oy, oz, ix, iy, iz, best_t)
+                    if hit is None or (accept and not accept(item)):
+                        continue
+                    if best is None or hit[0] < best_t:
+                        best_t = hit[0]
+                        best = (hit[0], item, hit[1], hit[2])
+                        if any_hit:
+                            return best
+                continue
+            # Visit the nearer child first so best_t shrinks sooner
+            a, b = left[node], right[node]
+            ta = _ray_node(node_boxes[a], ox, oy, oz, ix, iy, iz, best_t)
+            tb = _ray_node(node_boxes[b], ox, oy, oz, ix, iy, iz, best_t)
+            if ta is None:
+                if tb is not None:
+                    stack.append(b)
+            elif tb is None:
+                stack.append(a)
+            elif ta <= tb:
+                stack.append(b)
+                stack.append(a)
+            else:
+                stack.append(a)
+                stack.append(b)
+        return best
+
+
+def linear_intersect(boxes, origin, direction, max_t):
+    """Closest hit by testing every box; the reference the BVH is measured against."""
+    ox, oy, oz = origin
+    ix, iy, iz = _inverse(direction[0]), _inverse(direction[1]), _inverse(direction[2])
+    best = None
+    for item, b in enumerate(boxes):
+        hit = _ray_box(b, ox, oy, oz, ix, iy, iz, max_t)
+        if hit is not None and (best is None or hit[0] < best[0]):
+            best = (hit[0], item, hit[1], hit[2])
+            max_t = hit[0]
+    return best
+
+
+# -----------------------------------------------------------
+# Raycast Service
+# -----------------------------------------------------------
+def _entity_box(entity):
+    from ursina import scene
+
+    bounds = entity.model.getTightBounds(scene) if entity.model else None
+    if not bounds:
+        p = entity.world_position
+        return (p[0], p[1], p[2], p[0], p[1], p[2])
+    start, end = bounds
+    return (start[0], start[1], start[2], end[0], end[1], end[2])
+
+
+class RaycastService:
+    """
+    Answers Ursina-style raycasts from two BVHs over the entities with a
+    collider: a static tree built once, and a small dynamic tree for
+    entities that move (the train, the door, the player), refit at most
+    once per frame on the first query.
+
+    Colliders are treated as their world-space bounding boxes, which is
+    exact for the axis-aligned 'box' colliders of the station scenes.
+    Call rebuild() after adding or removing colliders.
+    """
+    def __init__(self, dynamic_roots=()):
+        self.dynamic_roots = list(dynamic_roots)
+        self.refit_frame = None
+        self.rebuild()
+
+    def rebuild(self):
+        from ursina import scene
+
+        static, dynamic = [], []
+        for e in scene.entities:
+            if not e.collider or not e.model:
+                continue
+            moving = any(e is root or e.has_ancestor(root) for root in self.dynamic_roots)
+            (dynamic if moving else static).append(e)
+        self.static_entities = static
+        self.dynamic_entities = dynamic
+        self.static = BVH([_entity_box(e) for e in static])
+        self.dynamic = BVH([_entity_box(e) for e in dynamic])
+        self.refit_frame = self._frame()
+
+    def _frame(self):
+        from panda3d.core import ClockObject
+
+        return ClockObject.getGlobalClock().getFrameCount()
+
+    def refit(self):
+        """Moves the dynamic tree's boxes to where their entities are now."""
+        self.dynamic.boxes = [_entity_box(e) for e in self.dynamic_entities]
+        self.dynamic.refit()
+        self.refit_frame = self._frame()
+
+    def _ensure_fresh(self):
+        if self.refit_frame != self._frame():
+            self.refit()
+
+    def _accept(self, entities, ignore, traverse_target):
+        from ursina import scene
+
+        ignored = {id(e) for e in ignore} if ignore else None
+        target = None if traverse_target is None or traverse_target is scene else traverse_target
+
+        def accept(item):
+            e = entities[item]
+            # ursina stashes colliders of disabled entities, their whole
+            # subtree, and of entities with collision turned off
+            if not e.enabled or not e.collision or (ignored and id(e) in ignored):
+                return False
+            if e.has_disabled_ancestor():
+                return False
+            return target is None or e is target or e.has_ancestor(target)
+        return accept
+
+    def _cast(self, origin, direction, distance, ignore, traverse_target, any_hit):
+        length = math.sqrt(direction[0] ** 2 + direction[1] ** 2 + direction[2] ** 2)
+        if length < _EPSILON:
+            return None
+        direction = (direction[0] / length, direction[1] / length, direction[2] / length)
+        origin = (origin[0], origin[1], origin[2])
+
+        best = None
+        for tree, entities in ((self.static, self.static_entities), (self.dynamic, self.dynamic_entities)):
+            hit = tree.intersect(origin, direction, distance if best is None else best[0],
+                                 self._accept(entities, ignore, traverse_target), any_hit)
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = (hit[0], entities[hit[1]], hit[2], hit[3])
+                if any_hit:
+                    break
+        return best, origin, direction
+
+    def raycast(self, origin, direction=(0, 0, 1), distance=9999, traverse_target=None, ignore=None, debug=False):
+        """Drop-in for ursina.raycast; returns a HitInfo."""
+        from ursina import Vec3, scene
+        from ursina.hit_info import HitInfo
+
+        self._ensure_fresh()
+        cast = self._cast(origin, direction, distance, ignore, traverse_target, False)
+        if cast is None or cast[0] is None:
+            return HitInfo(hit=False, distance=distance)
+
+        (t, entity, axis, inside), origin, direction = cast
+        world_point = Vec3(origin[0] + direction[0] * t, origin[1] + direction[1] * t, origin[2] + direction[2] * t)
+        world_normal = Vec3(0, 0, 0)
+        # Facing the ray, or along it for a ray leaving a box it started in
+        world_normal[axis] = -1 if (direction[axis] > 0) != inside else 1
+
+        hit_info = HitInfo(hit=True)
+        hit_info.entity = entity
+        hit_info.entities = [entity]
+        hit_info.distance = t
+        hit_info.world_point = world_point
+        hit_info.world_normal = world_normal
+        hit_info.point = entity.get_relative_point(scene, world_point)
+        hit_info.normal = Vec3(*entity.getRelativeVector(scene, world_normal).normalized())
+        return hit_info
+
+    def raycast_batch(self, rays, ignore=None, traverse_target=None):
+        """
+        Several raycasts in one call, e.g. the player's feet, head and
+        wall probes, or one pick per NPC. Each ray is (origin, direction,
+        distance). The dynamic tree is refit once for the whole batch.
+        """
+        self._ensure_fresh()
+        return [self.raycast(o, d, dist, traverse_target, ignore) for o, d, dist in rays]
+
+    def line_of_sight(self, pairs, ignore=None):
+        """
+        For each (from, to) point pair, whether nothing with a collider is
+        in between. Stops at the first blocker, so it is cheaper than a
+        raycast.
+        """
+        self._ensure_fresh()
+        results = []
+        for a, b in pairs:
+            delta = (b[0] - a[0], b[1] - a[1], b[2] - a[2])
+            distance = math.sqrt(delta[0] ** 2 + delta[1] ** 2 + delta[2] ** 2)
+            cast = self._cast(a, delta, distance, ignore, None, True)
+            results.append(cast is None or cast[0] is None)
+        return results
+
+    def install(self):
+        """Routes FirstPersonController's ground and wall raycasts through this service."""
+        from ursina.prefabs import first_person_controller
+
+        first_person_controller.raycast = self.raycast
+        return self
+
+
+def install_from_argv(dynamic_roots, argv=None):
+    """
+    Builds a RaycastService over the current scene and hands it the
+    player's raycasts, unless '--no-bvh' was given on the command line.
+    Call once the scene is built. Returns the service, or None.
+    """
+    import sys
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--no-bvh', action='store_true')
+    args, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    if args.no_bvh:
+        return None
+    return RaycastService(dynamic_roots).install()
+
+
+# -----------------------------------------------------------
+# Benchmark
+# -----------------------------------------------------------
+def random_props(count, rng, extent=100.0):
+    """Station-sized boxes scattered over the floor, like benches, posts and crates."""
+    props = []
+    for _ in range(count):
+        x, z = rng.uniform(-extent, extent), rng.uniform(-extent, extent)
+        sx, sy, sz = rng.uniform(0.2, 4), rng.uniform(0.5, 5), rng.uniform(0.2, 4)
+        props.append((x - sx / 2, 0.0, z - sz / 2, x + sx / 2, sy, z + sz / 2))
+    return props
+
+
+def random_rays(count, rng, extent=100.0):
+    """Half ground probes straight down, half horizontal wall / sight probes."""
+    rays = []
+    for i in range(count):
+        origin = (rng.uniform(-extent, extent), rng.uniform(0.5, 3), rng.uniform(-extent, extent))
+        if i % 2:
+            rays.append((origin, (0.0, -1.0, 0.0), 10.0))
+        else:
+            angle = rng.uniform(0, math.tau)
+            rays.append((origin, (math.cos(angle), 0.0, math.sin(angle)), 50.0))
+    return rays
+
+
+def _ursina_rays_per_second(props, rays):
+    """The current path: ursina.raycast against one box collider entity per prop."""
+    from ursina import Entity, destroy, raycast
+
+    entities = [Entity(model='cube', collider='box', position=((b[0] + b[3]) / 2, (b[1] + b[4]) / 2, (b[2] + b[5]) / 2),
+                       scale=(b[3] - b[0], b[4] - b[1], b[5] - b[2])) for b in props]
+    start = time.perf_counter()
+    for origin, direction, distance in rays:
+        raycast(origin, direction, distance)
+    elapsed = time.perf_counter() - start
+    for e in entities:
+        destroy(e)
+    return len(rays) / elapsed
+
+
+def benchmark(prop_counts=(100, 1000, 5000, 20000), ray_count=2000, with_ursina=True, seed=0):
+    rng = random.Random(seed)
+    rays = random_rays(ray_count, rng)
+    if with_ursina:
+        try:
+            from ursina import Ursina
+            Ursina(window_type='none')
+        except Exception as error:   # no ursina, or no way to open even a headless app
+            print(f"ursina.raycast not measured: {error}")
+            with_ursina = False
+
+    print(f"{'props':>7} {'build ms':>9} {'refit ms':>9} {'linear rays/s':>14} {'bvh rays/s':>11}"
+          + (f" {'ursina rays/s':>14}" if with_ursina else ''))
+    for count in prop_counts:
+        props = random_props(count, rng)
+        start = time.perf_counter()
+        tree = BVH(props)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        tree.refit()
+        refit = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = [linear_intersect(props, o, d, dist) for o, d, dist in rays]
+        linear = len(rays) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        found = [tree.intersect(o, d, dist) for o, d, dist in rays]
+        fast = len(rays) / (time.perf_counter() - start)
+
+        mismatches = sum((a is None) != (b is None) or (a is not None and abs(a[0] - b[0]) > 1e-6)
+                         for a, b in zip(expected, found))
+        line = f"{count:>7} {build * 1000:>9.1f} {refit * 1000:>9.2f} {linear:>14,.0f} {fast:>11,.0f}"
+        if with_ursina:
+            line += f" {_ursina_rays_per_second(props, rays):>14,.0f}"
+        if mismatches:
+            line += f"  ({mismatches} results differ from the linear test)"
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare BVH raycasts with testing every collider')
+    parser.add_argument('--props', type=int, nargs='+', default=[100, 1000, 5000, 20000])
+    parser.add_argument('--rays', type=int, default=2000)
+    parser.add_argument('--no-ursina', action='store_true', help="skip timing ursina.raycast")
+    args = parser.parse_args()
+    benchmark(args.props, args.rays, not args.no_ursina)
@@ -0,0 +1,419 @@
+import argparse
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# -----------------------------------------------------------
+# Station Layout (matches hl3.py / train_0.py)
+# -----------------------------------------------------------
+# The crowd is a standalone subsystem: the station scripts do not create
+# it yet, 'python crowd.py demo' runs it in a stand-in station with a
+# train that stops at the platforms. Passengers only board while the
+# train passed to CrowdSimulation.step() is stopped alongside a platform.
+STATION_HALF = 99.0                  # inner face of the walls
+PLATFORM_SPANS = ((-75, -25), (25, 75))
+PLATFORM_EDGES_Z = (-22.5, -17.5)    # footprint of the platform blocks
+PLATFORM_HEIGHT = 1.0                # top of the platform blocks
+PLATFORM_Z = (-22.0, -18.0)          # where passengers wait
+DOOR_Z = -2.5                        # train doors face the platforms
+TRAIN_HALF_LENGTH = 5.0              # doors span the train body, as in hl3.py
+TRAIN_STOPPED_SPEED = 0.1            # m/s below which the doors are open
+
+AGENT_SPEED = 1.4                    # m/s, walking pace
+STEERING = 4.0                       # how quickly velocity turns toward the goal
+AVOIDANCE = 6.0                      # push away from crowded cells
+CELL_SIZE = 2.0
+GRID_CELLS = int(2 * STATION_HALF / CELL_SIZE) + 1
+ARRIVE_RADIUS = 1.0
+MAX_STEP_DT = 0.1                    # longest time one step may integrate
+
+BOARDING, ALIGHTING = 0, 1
+
+
+# -----------------------------------------------------------
+# Worker Side
+# -----------------------------------------------------------
+# Each worker attaches the shared blocks once and keeps numpy views on
+# them, so a step only sends slice bounds, dt and the door span through
+# the pool.
+_shared = {}
+
+
+def _attach(names, count):
+    blocks = {key: shared_memory.SharedMemory(name=name) for key, name in names.items()}
+    _map_views(blocks, count)
+
+
+def _map_views(blocks, count):
+    _shared['blocks'] = blocks
+    _shared['positions'] = np.ndarray((2, count, 2), dtype=np.float32, buffer=blocks['positions'].buf)
+    _shared['velocities'] = np.ndarray((2, count, 2), dtype=np.float32, buffer=blocks['velocities'].buf)
+    _shared['heights'] = np.ndarray((2, count), dtype=np.float32, buffer=blocks['heights'].buf)
+    _shared['targets'] = np.ndarray((count, 2), dtype=np.float32, buffer=blocks['targets'].buf)
+    _shared['states'] = np.ndarray((count,), dtype=np.int8, buffer=blocks['states'].buf)
+
+
+def _cell_index(positions):
+    cells = ((positions + STATION_HALF) / CELL_SIZE).astype(np.int32)
+    np.clip(cells, 0, GRID_CELLS - 1, out=cells)
+    return cells[:, 0], cells[:, 1]
+
+
+def surface_height(positions):
+    """Height of the floor under each (x, z) position: a platform top or the ground."""
+    x, z = positions[:, 0], positions[:, 1]
+    on_platform = (z >= PLATFORM_EDGES_Z[0]) & (z <= PLATFORM_EDGES_Z[1])
+    in_span = np.zeros(len(positions), dtype=bool)
+    for lo, hi in PLATFORM_SPANS:
+        in_span |= (x >= lo) & (x <= hi)
+    return np.where(on_platform & in_span, PLATFORM_HEIGHT, 0.0).astype(np.float32)
+
+
+def pick_targets(rng, states):
+    """
+    Random goals for agents in the given states: a spot on a platform, at
+    the track edge for boarding agents, who wait there for a train.
+    """
+    count = len(states)
+    targets = np.empty((count, 2), dtype=np.float32)
+    boarding = states == BOARDING
+
+    span = rng.integers(0, len(PLATFORM_SPANS), count)
+    lo = np.array([s[0] for s in PLATFORM_SPANS], dtype=np.float32)[span]
+    hi = np.array([s[1] for s in PLATFORM_SPANS], dtype=np.float32)[span]
+    targets[:, 0] = lo + (hi - lo) * rng.random(count, dtype=np.float32)
+    platform_z = PLATFORM_Z[0] + (PLATFORM_Z[1] - PLATFORM_Z[0]) * rng.random(count, dtype=np.float32)
+    targets[:, 1] = np.where(boarding, PLATFORM_Z[1], platform_z)
+    return targets
+
+
+def door_span(train):
+    """
+    (min_x, max_x) of the doors of a train given as (x, speed), or None
+    unless it is stopped alongside a platform.
+    """
+    if train is None:
+        return None
+    x, speed = train
+    if abs(speed) > TRAIN_STOPPED_SPEED:
+        return None
+    lo, hi = x - TRAIN_HALF_LENGTH, x + TRAIN_HALF_LENGTH
+    if not any(lo < span_hi and hi > span_lo for span_lo, span_hi in PLATFORM_SPANS):
+        return None
+    return lo, hi
+
+
+def step_slice(start, end, front, dt, seed, doors=None):
+    """
+    Advances agents [start, end) one step. Reads every agent from the front
+    buffer (for crowd density) and writes its own slice into the back buffer.
+    doors is the door span of a stopped train (see door_span()), or None.
+    """
+    positions, velocities = _shared['positions'], _shared['velocities']
+    targets, states = _shared['targets'], _shared['states']
+    back = 1 - front
+    everyone = positions[front]
+
+    # Crowd density on a coarse grid; agents steer down its gradient
+    cx, cz = _cell_index(everyone)
+    density = np.bincount(cx * GRID_CELLS + cz, minlength=GRID_CELLS * GRID_CELLS)
+    density = density.reshape(GRID_CELLS, GRID_CELLS).astype(np.float32)
+    grad_x, grad_z = np.gradient(density)
+
+    pos = everyone[start:end]
+    vel = velocities[front, start:end]
+    mx, mz = cx[start:end], cz[start:end]
+    avoid = -np.stack((grad_x[mx, mz], grad_z[mx, mz]), axis=1)
+
+    # Boarding agents wait at the platform edge until a train stops,
+    # then head for the nearest point of its doors
+    boarding = states[start:end] == BOARDING
+    goals = targets[start:end].copy()
+    if doors is not None:
+        goals[boarding, 0] = np.clip(goals[boarding, 0], doors[0], doors[1])
+        goals[boarding, 1] = DOOR_Z
+
+    to_goal = goals - pos
+    distance = np.linalg.norm(to_goal, axis=1, keepdims=True)
+    desired = to_goal / np.maximum(distance, 1e-6) * AGENT_SPEED
+
+    new_vel = vel + ((desired - vel) * STEERING + avoid * AVOIDANCE) * dt
+    speed = np.linalg.norm(new_vel, axis=1, keepdims=True)
+    new_vel *= np.minimum(1.0, AGENT_SPEED * 1.5 / np.maximum(speed, 1e-6))
+
+    new_pos = pos + new_vel * dt
+    np.clip(new_pos, -STATION_HALF, STATION_HALF, out=new_pos)
+    positions[back, start:end] = new_pos
+    velocities[back, start:end] = new_vel
+    _shared['heights'][back, start:end] = surface_height(new_pos)
+
+    # Arrived agents board or alight and get a new goal
+    arrived = distance[:, 0] < ARRIVE_RADIUS
+    if doors is None:
+        arrived &= ~boarding
+    arrived = np.flatnonzero(arrived)
+    if len(arrived):
+        rng = np.random.default_rng((seed, start))
+        own_states = states[start:end]
+        own_states[arrived] = 1 - own_states[arrived]
+        targets[start + arrived] = pick_targets(rng, own_states[arrived])
+
+
+# -----------------------------------------------------------
+# Crowd Simulation
+# -----------------------------------------------------------
+class CrowdSimulation:
+    """
+    Passenger crowd advanced by a process pool over shared memory.
+    Positions are double buffered: workers write the back buffer while the
+    render thread reads 'positions' (a view of the front buffer) directly.
+    step() never blocks; it swaps buffers when the workers have finished,
+    and the next step covers all the time that passed while they worked.
+    Pass step() the train on the platform track so passengers board only
+    while it stands at a platform.
+    """
+    def __init__(self, count=2000, workers=None, seed=0):
+        self.count = count
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.seed = seed
+        self.tick = 0
+        self.front = 0
+        self.pending = None
+        self.pending_started = 0.0
+        self.last_step_time = 0.0
+        self.elapsed = 0.0
+
+        sizes = {
+            'positions': 2 * count * 2 * 4,
+            'velocities': 2 * count * 2 * 4,
+            'heights': 2 * count * 4,
+            'targets': count * 2 * 4,
+            'states': count,
+        }
+        self.blocks = {key: shared_memory.SharedMemory(create=True, size=size) for key, size in sizes.items()}
+        names = {key: block.name for key, block in self.blocks.items()}
+        _map_views(self.blocks, count)
+        self.all_positions = _shared['positions']
+
+        rng = np.random.default_rng(seed)
+        states = rng.integers(0, 2, count).astype(np.int8)
+        _shared['states'][:] = states
+        # Everyone starts on a platform and half of them head for the train
+        start = pick_targets(rng, np.full(count, ALIGHTING, dtype=np.int8))
+        self.all_positions[:] = start
+        self.all_heights = _shared['heights']
+        self.all_heights[:] = surface_height(start)
+        _shared['velocities'][:] = 0
+        _shared['targets'][:] = pick_targets(rng, states)
+
+        bounds = np.linspace(0, count, self.workers + 1).astype(int)
+        self.slices = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+        self.pool = multiprocessing.get_context().Pool(self.workers, initializer=_attach, initargs=(names, count))
+
+    @property
+    def positions(self):
+        """(count, 2) float32 x/z view of the latest finished step. Do not keep across steps."""
+        return self.all_positions[self.front]
+
+    @property
+    def heights(self):
+        """(count,) float32 floor height under each agent, matching 'positions'."""
+        return self.all_heights[self.front]
+
+    def step(self, dt, train=None):
+        """
+        Collects a finished step (swapping buffers) and starts the next one.
+        train is (x, speed) of the train on the platform track, or None.
+        Returns True when new positions became visible.
+        """
+        # Frames that pass while the workers are busy still count
+        self.elapsed += dt
+        swapped = False
+        if self.pending is not None:
+            if not self.pending.ready():
+                return False
+            self.pending.get()
+            self.front = 1 - self.front
+            self.last_step_time = time.perf_counter() - self.pending_started
+            swapped = True
+
+        self.tick += 1
+        dt = min(self.elapsed, MAX_STEP_DT)
+        self.elapsed = 0.0
+        doors = door_span(train)
+        jobs = [(a, b, self.front, dt, (self.seed, self.tick), doors) for a, b in self.slices]
+        self.pending_started = time.perf_counter()
+        self.pending = self.pool.starmap_async(_step_job, jobs)
+        return swapped
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        _shared.clear()
+        self.all_positions = None
+        self.all_heights = None
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+
+
+def _step_job(start, end, front, dt, seed, doors):
+    step_slice(start, end, front, dt, seed, doors)
+
+
+# -----------------------------------------------------------
+# Instanced Rendering
+# -----------------------------------------------------------
+CROWD_VERTEX = '''
+#version 140
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform samplerBuffer agent_positions;   // x, floor height, z
+uniform vec3 agent_scale;
+in vec4 p3d_Vertex;
+in vec3 p3d_Normal;
+out float shade;
+
+void main() {
+    vec3 p = texelFetch(agent_positions, gl_InstanceID).xyz;
+    vec3 v = p3d_Vertex.xyz * agent_scale + vec3(p.x, p.y + agent_scale.y * 0.5, p.z);
+    gl_Position = p3d_ModelViewProjectionMatrix * vec4(v, 1.0);
+    shade = 0.6 + 0.4 * abs(p3d_Normal.y);
+}
+'''
+
+CROWD_FRAGMENT = '''
+#version 140
+uniform vec4 agent_color;
+in float shade;
+out vec4 fragColor;
+
+void main() {
+    fragColor = vec4(agent_color.rgb * shade, agent_color.a);
+}
+'''
+
+
+class CrowdRenderer:
+    """
+    Draws every agent in one instanced draw call. Each frame the front
+    position buffer is written straight from shared memory into a GPU
+    buffer texture that the vertex shader indexes by instance id.
+    Give it the train entity so the simulation knows when it is stopped.
+    """
+    def __init__(self, simulation, train=None, agent_scale=(0.5, 1.8, 0.5), agent_color=None):
+        from panda3d.core import GeomEnums, OmniBoundingVolume, Texture
+        from ursina import Entity, Shader, Vec3, Vec4, color
+
+        self.simulation = simulation
+        self.train = train
+        self.train_x = train.x if train is not None else 0.0
+        self.buffer = Texture('agent_positions')
+        # RGBA rather than RGB: three-channel buffer textures need GL 4.0
+        self.buffer.setup_buffer_texture(simulation.count, Texture.T_float, Texture.F_rgba32, GeomEnums.UH_dynamic)
+
+        self.entity = Entity(model='cube', shader=Shader(language=Shader.GLSL, vertex=CROWD_VERTEX, fragment=CROWD_FRAGMENT))
+        self.entity.set_shader_input('agent_positions', self.buffer)
+        self.entity.set_shader_input('agent_scale', Vec3(*agent_scale))
+        self.entity.set_shader_input('agent_color', Vec4(*(agent_color or color.orange)))
+        self.entity.setInstanceCount(simulation.count)
+        # Instances are placed by the shader, so the node's own bounds mean nothing
+        self.entity.node().setBounds(OmniBoundingVolume())
+        self.entity.node().setFinal(True)
+        self.entity.update = self.update
+        self.upload()
+
+    def upload(self):
+        ram = np.frombuffer(self.buffer.modify_ram_image(), dtype=np.float32).reshape(-1, 4)
+        positions = self.simulation.positions
+        ram[:, 0] = positions[:, 0]
+        ram[:, 1] = self.simulation.heights
+        ram[:, 2] = positions[:, 1]
+
+    def update(self):
+        train = None
+        if self.train is not None and time.dt > 0:
+            # Measured rather than read from the train, which may be moved by the network
+            train = (self.train.x, (self.train.x - self.train_x) / time.dt)
+            self.train_x = self.train.x
+        if self.simulation.step(time.dt, train):
+            self.upload()
+
+
+# -----------------------------------------------------------
+# Benchmark / Demo
+# -----------------------------------------------------------
+def benchmark(agent_counts=(1000, 5000, 20000), steps=100, workers=None):
+    """Reports worker step time and how long step() blocks the caller."""
+    print(f"{'agents':>8} {'workers':>8} {'step ms':>9} {'caller ms':>10}")
+    for count in agent_counts:
+        simulation = CrowdSimulation(count, workers)
+        caller = 0.0
+        swaps = 0
+        step_total = 0.0
+        while swaps < steps:
+            start = time.perf_counter()
+            if simulation.step(1 / 60):
+                swaps += 1
+                step_total += simulation.last_step_time
+            caller += time.perf_counter() - start
+            time.sleep(0.001)
+        print(f"{count:>8} {simulation.workers:>8} {step_total / steps * 1000:>9.3f} {caller / steps * 1000:>10.3f}")
+        simulation.close()
+
+
+def demo(count, workers=None):
+    from ursina import Entity, EditorCamera, Ursina, color, window
+
+    # The train stops at each platform in turn, then runs back to the start
+    stops = [(lo + hi) / 2 for lo, hi in PLATFORM_SPANS]
+    train_speed, dwell = 8.0, 12.0
+
+    def run_train():
+        if train.wait > 0:
+            train.wait -= time.dt
+            return
+        target = stops[train.stop] if train.stop < len(stops) else 100
+        train.x = min(target, train.x + time.dt * train_speed)
+        if train.x < target:
+            return
+        if train.stop < len(stops):
+            train.stop += 1
+            train.wait = dwell
+        else:
+            train.x, train.stop = -100, 0
+
+    app = Ursina()
+    window.fps_counter.enabled = True
+    Entity(model='plane', scale=(200, 1, 200), color=color.dark_gray)
+    for x in (-50, 50):
+        Entity(model='cube', scale=(50, 1, 5), position=(x, 0.5, -20), color=color.gray)
+    Entity(model='cube', scale=(200, 0.5, 2), position=(0, 0.25, 0), color=color.black)
+    train = Entity(model='cube', scale=(2 * TRAIN_HALF_LENGTH, 3, 5), position=(-100, 1.5, 0), color=color.white)
+    train.stop, train.wait = 0, 0.0
+    train.update = run_train
+    EditorCamera(rotation=(45, 0, 0), position=(0, 0, -20))
+
+    simulation = CrowdSimulation(count, workers)
+    CrowdRenderer(simulation, train)
+    try:
+        app.run()
+    finally:
+        simulation.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Passenger crowd simulation')
+    parser.add_argument('mode', choices=('demo', 'bench'))
+    parser.add_argument('--agents', type=int, nargs='*', default=[1000, 5000, 20000])
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--steps', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.mode == 'demo':
+        demo(args.agents[0], args.workers)
+    else:
+        benchmark(args.agents, args.steps, args.workers)
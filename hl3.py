@@ -1,8 +1,18 @@
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
+import bvh
+import netsync
+import quality
+import replay
 
 # Initialize Ursina App
-app = Ursina()
+quality_preset = quality.active()
+app = Ursina(**quality_preset.window_options())
+if quality_preset.fps_counter:
+    window.fps_counter.enabled = True
+
+# Multiplayer (--connect host:port); None when playing alone
+net = netsync.client_from_argv()
 
 # Load Textures
 brick_texture = load_texture('assets/brick_wall.png')
@@ -138,6 +148,8 @@ class Train(Entity):
         self.speed = 8
 
     def update(self):
+        if net:
+            return  # the server moves the train
         self.x += time.dt * self.speed
         if self.x > 50:
             self.x = -80  # Reset to start position for looping
@@ -194,6 +206,28 @@ def open_door():
         if door.y > 7:
             door.y = 7
 
+remote_players = {}
+
+def sync_network():
+    net.send_pose(player.x, player.y, player.z, player.rotation_y)
+    net.poll()
+    states = net.interpolated(time.dt)
+    for entity_id, (kind, x, y, z, rot, flags) in states.items():
+        if kind == netsync.TRAIN:
+            train.position = Vec3(x, y, z)
+        elif kind == netsync.DOOR:
+            door.position = Vec3(x, y, z)
+        elif kind == netsync.PLAYER:
+            if entity_id not in remote_players:
+                remote_players[entity_id] = Entity(model='cube', scale=(1, 2, 1), color=color.azure)
+            remote_players[entity_id].position = Vec3(x, y + 1, z)
+            remote_players[entity_id].rotation_y = rot
+            remote_players[entity_id].enabled = True
+    # Players outside the interest radius stop being sent
+    for entity_id, ghost in remote_players.items():
+        if entity_id not in states:
+            ghost.enabled = False
+
 def update():
     global train_arrived
 
@@ -204,8 +238,17 @@ def update():
         if abs(player.position.x - npc.position.x) < 2 and abs(player.position.z - npc.position.z) < 2:
             print("NPC Interaction: Welcome to the station!")
 
-    # Door Mechanic
-    open_door()
+    # Door Mechanic (server-side when connected)
+    if net:
+        sync_network()
+    else:
+        open_door()
+
+# Player raycasts through a BVH of the colliders (--no-bvh for ursina.raycast)
+raycasts = bvh.install_from_argv(dynamic_roots=[player, train, door])
+
+# Input Recording / Replay (--record / --replay)
+replay.install_from_argv(app)
 
 # Start Application
 app.run()
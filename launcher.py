@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import runpy
+import subprocess
+import sys
+
+import quality
+
+# -----------------------------------------------------------
+# Scenes
+# -----------------------------------------------------------
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCENES = {
+    'hl3': 'hl3.py',
+    'train': 'train_0.py',
+    'advanced': 'srcx.x.x.v-o.py',
+}
+
+TARGET_FPS = 60
+CALIBRATION_SECONDS = 4.0
+CALIBRATION_WARMUP = 1.0
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.hl3beta_quality.json')
+
+
+# -----------------------------------------------------------
+# Calibration
+# -----------------------------------------------------------
+def calibration_scene(tier):
+    """
+    Renders a stress scene at the given tier with vsync off and prints
+    'CALIBRATION <avg fps> <95th percentile frame ms>' before quitting.
+    Runs in its own process, since Ursina allows one window per process.
+    """
+    import math
+    import time
+    from ursina import (AmbientLight, DirectionalLight, Entity, Plane, PointLight, Ursina, Vec2,
+                        application, camera, color, window)
+    from ursina.shaders import lit_with_shadows_shader
+
+    preset = quality.PRESETS[tier]
+    app = Ursina(vsync=False, size=preset.window_size or (1440, 935), borderless=False)
+    window.title = f'Calibrating {tier}...'
+
+    DirectionalLight(y=20, rotation=(45, -45, 0), shadows=preset.shadows,
+                     shadow_map_resolution=Vec2(preset.shadow_resolution, preset.shadow_resolution))
+    AmbientLight(color=color.rgba(0.3, 0.3, 0.4, 0.5))
+    for i in range(preset.max_point_lights):
+        PointLight(position=(-30 + i * 20, 10, 0), color=color.white, shadows=preset.shadows)
+
+    Entity(model=Plane(subdivisions=(preset.tessellation, preset.tessellation)), scale=200,
+           color=color.gray, shader=lit_with_shadows_shader)
+    # Roughly the prop count of the station scenes, all lit and shadowed
+    for x in range(-45, 46, 5):
+        for z in range(-45, 46, 15):
+            Entity(model='cube', position=(x, 1, z), scale=(2, 2, 2), color=color.light_gray,
+                   shader=lit_with_shadows_shader)
+    if preset.post_processing:
+        camera.shader = lit_with_shadows_shader
+
+    frame_times = []
+    started = time.perf_counter()
+    last = [started]
+
+    def update():
+        now = time.perf_counter()
+        if now - started > CALIBRATION_WARMUP:
+            frame_times.append(now - last[0])
+        last[0] = now
+        # Orbit the camera so shadows and culling change every frame
+        angle = (now - started) * 0.5
+        camera.position = (math.sin(angle) * 80, 30, math.cos(angle) * 80)
+        camera.look_at((0, 0, 0))
+        if now - started > CALIBRATION_WARMUP + CALIBRATION_SECONDS:
+            ordered = sorted(frame_times) or [1.0]
+            fps = len(ordered) / sum(ordered)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            print(f'CALIBRATION {fps:.1f} {p95 * 1000:.2f}', flush=True)
+            application.quit()
+
+    Entity(update=update)
+    app.run()
+
+
+def measure_tier(tier):
+    """Runs the calibration scene for a tier in a child process; returns (fps, p95 ms) or None."""
+    try:
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), '--calibrate-tier', tier],
+                                capture_output=True, text=True, cwd=HERE,
+                                timeout=CALIBRATION_WARMUP + CALIBRATION_SECONDS + 60)
+    except subprocess.TimeoutExpired:
+        return None
+    for line in result.stdout.splitlines():
+        if line.startswith('CALIBRATION '):
+            _, fps, p95 = line.split()
+            return float(fps), float(p95)
+    return None
+
+
+def detect_tier(recalibrate=False):
+    """
+    Picks the best tier whose calibration run keeps 95% of frames within
+    the TARGET_FPS frame budget. The result is cached per machine.
+    """
+    if not recalibrate and os.path.exists(CACHE_PATH):
+        with open(CACHE_PATH) as f:
+            cached = json.load(f)
+        if cached.get('tier') in quality.PRESETS:
+            print(f"Using cached quality tier '{cached['tier']}' (--recalibrate to measure again)")
+            return cached['tier']
+
+    budget_ms = 1000 / TARGET_FPS
+    measured = {}
+    chosen = quality.AUTO_TIERS[-1]
+    for tier in quality.AUTO_TIERS:
+        result = measure_tier(tier)
+        measured[tier] = result
+        if result is None:
+            print(f"  {tier:<8} calibration failed")
+            continue
+        fps, p95 = result
+        print(f"  {tier:<8} {fps:6.1f} fps, 95% of frames under {p95:.2f} ms")
+        if p95 <= budget_ms:
+            chosen = tier
+            break
+
+    # Don't remember a guess made without a single successful measurement
+    if any(measured.values()):
+        with open(CACHE_PATH, 'w') as f:
+            json.dump({'tier': chosen, 'measured': measured, 'target_fps': TARGET_FPS}, f, indent=2)
+    print(f"Auto-detected quality tier: '{chosen}'")
+    return chosen
+
+
+# -----------------------------------------------------------
+# Launch
+# -----------------------------------------------------------
+def launch(scene, tier, extra_args):
+    """Runs a scene script in this process with the chosen tier active."""
+    script = os.path.join(HERE, SCENES[scene])
+    os.environ[quality.QUALITY_ENV] = tier
+    sys.argv = [script] + list(extra_args)
+    sys.path.insert(0, HERE)
+    print(f"Launching {SCENES[scene]} at '{tier}' quality")
+    runpy.run_path(script, run_name='__main__')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Run one of the station scenes with a quality tier.',
+        epilog='Unrecognised arguments (e.g. --record run.hl3r) are passed on to the scene.')
+    parser.add_argument('scene', nargs='?', choices=sorted(SCENES), default='hl3')
+    parser.add_argument('--quality', default=quality.DEFAULT_TIER, choices=list(quality.PRESETS) + ['auto'])
+    parser.add_argument('--recalibrate', action='store_true', help='ignore the cached auto-detect result')
+    parser.add_argument('--calibrate-tier', choices=list(quality.PRESETS), help=argparse.SUPPRESS)
+    args, extra = parser.parse_known_args()
+
+    if args.calibrate_tier:
+        calibration_scene(args.calibrate_tier)
+    else:
+        tier = detect_tier(args.recalibrate) if args.quality == 'auto' else args.quality
+        launch(args.scene, tier, extra)
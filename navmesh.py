@@ -0,0 +1,785 @@
+import argparse
+import heapq
+import math
+import os
+import struct
+import tempfile
+import time
+from array import array
+from collections import OrderedDict
+
+
+# -----------------------------------------------------------
+# Colliders
+# -----------------------------------------------------------
+# Colliders are world-space boxes: (min_x, min_y, min_z, max_x, max_y, max_z).
+
+def colliders_from_entities(entities):
+    """World-space bounding boxes of Ursina entities with a collider."""
+    from ursina import scene
+
+    boxes = []
+    for e in entities:
+        if not e.collider or not e.model:
+            continue
+        bounds = e.model.getTightBounds(scene)
+        if not bounds:
+            continue
+        start, end = bounds
+        boxes.append((start[0], start[1], start[2], end[0], end[1], end[2]))
+    return boxes
+
+
+def box(position, scale):
+    """Box collider of an Ursina 'cube' entity with the given position and scale."""
+    (x, y, z), (sx, sy, sz) = position, scale
+    return (x - sx / 2, y - sy / 2, z - sz / 2, x + sx / 2, y + sy / 2, z + sz / 2)
+
+
+def station_colliders():
+    """The static colliders of hl3.py / train_0.py, for baking without a window."""
+    colliders = [(-100, 0, -100, 100, 0, 100)]  # ground plane
+    colliders += [box(p, s) for p, s in (
+        ((-100, 5, 0), (1, 10, 200)), ((100, 5, 0), (1, 10, 200)),
+        ((0, 5, 100), (200, 10, 1)), ((0, 5, -100), (200, 10, 1)),
+        ((-50, 0.5, -20), (50, 1, 5)), ((50, 0.5, -20), (50, 1, 5)),
+        ((0, 6, -20.25), (5, 2, 0)),                    # sign
+        ((10, 1, -5), (1, 2, 1)),                       # npc
+        ((0, 3.5, 20), (3, 7, 1)),                      # door
+    )]
+    colliders += [box((i, 1, -20), (4, 1, 2)) for i in range(-45, 46, 10)]
+    for i in range(-45, 46, 15):
+        colliders.append(box((i, 2.5, -18), (0.2, 5, 0.2)))
+        colliders.append(box((i, 5.5, -18), (0.5, 0.5, 0.5)))
+    colliders += [box((i, 0.25, 0), (10, 0.5, 2)) for i in range(-100, 101, 10)]
+    return colliders
+
+
+# -----------------------------------------------------------
+# NavMesh
+# -----------------------------------------------------------
+NAV_MAGIC = b'HL3N'
+NAV_VERSION = 1
+TILE_SIZE = 8                         # cells per tile side; the unit of rebuilds and of the coarse graph
+_NAV_HEADER = struct.Struct('<4sH4f4fII')
+_EDGE = struct.Struct('<IIf')
+
+_NEIGHBORS = ((1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+              (1, 1, math.sqrt(2)), (1, -1, math.sqrt(2)), (-1, 1, math.sqrt(2)), (-1, -1, math.sqrt(2)))
+
+
+class NavMesh:
+    """
+    Grid navmesh baked from box colliders. Each cell stores the height of
+    the surface an agent stands on there and whether it is walkable
+    (enough headroom, not within agent_radius of a drop or obstacle).
+
+    The grid is split into tiles. Every open stretch of a tile border gets
+    one entrance cell on each side; 'graph' links entrances across borders
+    and, with their walking cost, to the other entrances of the same tile.
+    """
+    def __init__(self, bounds=(-100, -100, 100, 100), cell_size=1.0,
+                 agent_height=1.8, agent_radius=0.4, max_step=0.5):
+        self.bounds = tuple(float(v) for v in bounds)
+        self.cell_size = float(cell_size)
+        self.agent_height = float(agent_height)
+        self.agent_radius = float(agent_radius)
+        self.max_step = float(max_step)
+        self.width = int(math.ceil((self.bounds[2] - self.bounds[0]) / self.cell_size))
+        self.depth = int(math.ceil((self.bounds[3] - self.bounds[1]) / self.cell_size))
+        self.erosion = int(math.ceil(self.agent_radius / self.cell_size))
+
+        cells = self.width * self.depth
+        self.colliders = []
+        self.heights = array('f', bytes(4 * cells))
+        self.raw = bytearray(cells)        # walkable before erosion
+        self.blocked = bytearray(cells)    # within agent_radius of an obstacle's real edges
+        self.walkable = bytearray(cells)
+        self.links = [()] * cells          # neighbors() of every cell, precomputed
+        self.tile_nodes = {}               # tile -> frozenset of entrance cells
+        self.tile_edges = {}               # tile -> {entrance: {entrance: cost}}
+        self.graph = {}                    # entrance -> {entrance: cost}
+        self.generation = 0                # bumped on every rebuild so caches can tell
+
+    # ---------- Baking ----------
+    def bake(self, colliders):
+        self.colliders = list(colliders)
+        self.rebuild_cells(0, 0, self.width, self.depth)
+
+    def rebuild_zone(self, aabb, colliders=None):
+        """
+        Re-bakes only the tiles around aabb (a collider box), e.g. after a
+        door moved or a prop was added. Pass the new collider list if it changed.
+        """
+        if colliders is not None:
+            self.colliders = list(colliders)
+        x0, z0 = self.cell_of(aabb[0], aabb[2], clamp=True)
+        x1, z1 = self.cell_of(aabb[3], aabb[5], clamp=True)
+        margin = self.erosion + 1
+        x0 = max(0, (x0 - margin) // TILE_SIZE * TILE_SIZE)
+        z0 = max(0, (z0 - margin) // TILE_SIZE * TILE_SIZE)
+        x1 = min(self.width, ((x1 + margin) // TILE_SIZE + 1) * TILE_SIZE)
+        z1 = min(self.depth, ((z1 + margin) // TILE_SIZE + 1) * TILE_SIZE)
+        self.rebuild_cells(x0, z0, x1, z1)
+
+    def rebuild_cells(self, x0, z0, x1, z1):
+        """Re-bakes a tile-aligned cell range and the coarse graph around it."""
+        # Erosion looks at neighbours, so rasterize a margin around the zone
+        m = self.erosion
+        self._rasterize(max(0, x0 - m), max(0, z0 - m), min(self.width, x1 + m), min(self.depth, z1 + m))
+        self._erode(x0, z0, x1, z1)
+        self._link(max(0, x0 - 1), max(0, z0 - 1), min(self.width, x1 + 1), min(self.depth, z1 + 1))
+        dirty = {(tx, tz) for tx in range(x0 // TILE_SIZE, (x1 - 1) // TILE_SIZE + 1)
+                 for tz in range(z0 // TILE_SIZE, (z1 - 1) // TILE_SIZE + 1)}
+        self._build_graph(dirty)
+        self.generation += 1
+
+    def _rasterize(self, x0, z0, x1, z1):
+        cs = self.cell_size
+        min_x, min_z = self.bounds[0], self.bounds[1]
+        wx0, wz0 = min_x + x0 * cs, min_z + z0 * cs
+        wx1, wz1 = min_x + x1 * cs, min_z + z1 * cs
+
+        spans = {}
+        obstacles = []
+        r = self.agent_radius
+        for c in self.colliders:
+            if c[3] < wx0 - r or c[0] > wx1 + r or c[5] < wz0 - r or c[2] > wz1 + r:
+                continue
+            obstacles.append(c)
+            # Cells whose centre lies inside the collider footprint
+            cx0 = max(x0, int(math.ceil((c[0] - min_x) / cs - 0.5)))
+            cx1 = min(x1 - 1, int(math.floor((c[3] - min_x) / cs - 0.5)))
+            cz0 = max(z0, int(math.ceil((c[2] - min_z) / cs - 0.5)))
+            cz1 = min(z1 - 1, int(math.floor((c[5] - min_z) / cs - 0.5)))
+            for cz in range(cz0, cz1 + 1):
+                row = cz * self.width
+                for cx in range(cx0, cx1 + 1):
+                    spans.setdefault(row + cx, []).append((c[1], c[4]))
+
+        for cz in range(z0, z1):
+            row = cz * self.width
+            for cx in range(x0, x1):
+                i = row + cx
+                floor = self._standing_height(spans.get(i))
+                self.raw[i] = floor is not None
+                self.heights[i] = floor if floor is not None else 0.0
+                self.blocked[i] = 0
+
+        # Sampling cell centres misses colliders thinner than a cell (lamp
+        # poles), so also block every cell whose square comes within
+        # agent_radius of a collider that stands in the way at its height.
+        # Moves only join neighbouring cells, so a path through unblocked
+        # cells keeps the agent clear of the real box.
+        for c in obstacles:
+            bx0 = max(x0, int(math.floor((c[0] - r - min_x) / cs)))
+            bx1 = min(x1 - 1, int(math.ceil((c[3] + r - min_x) / cs)) - 1)
+            bz0 = max(z0, int(math.floor((c[2] - r - min_z) / cs)))
+            bz1 = min(z1 - 1, int(math.ceil((c[5] + r - min_z) / cs)) - 1)
+            for cz in range(bz0, bz1 + 1):
+                row = cz * self.width
+                for cx in range(bx0, bx1 + 1):
+                    i = row + cx
+                    h = self.heights[i]
+                    if c[4] > h + self.max_step and c[1] < h + self.agent_height:
+                        self.blocked[i] = 1
+
+    def _standing_height(self, cell_spans):
+        """Highest collider top in a cell with agent_height of free space above it."""
+        if not cell_spans:
+            return None
+        for bottom, top in sorted(cell_spans, key=lambda s: -s[1]):
+            ceiling = top + self.agent_height
+            if all(not (b < ceiling and t > top) for b, t in cell_spans):
+                return top
+        return None
+
+    def _erode(self, x0, z0, x1, z1):
+        # A cell stays walkable if every cell within agent_radius is walkable
+        # and no further above or below it than max_step per cell
+        width, depth, raw, heights = self.width, self.depth, self.raw, self.heights
+        reach = self.erosion
+        for cz in range(z0, z1):
+            for cx in range(x0, x1):
+                i = cz * width + cx
+                ok = raw[i]
+                if ok and reach:
+                    h = heights[i]
+                    for nz in range(cz - reach, cz + reach + 1):
+                        if not ok:
+                            break
+                        if nz < 0 or nz >= depth:
+                            ok = False
+                            break
+                        for nx in range(cx - reach, cx + reach + 1):
+                            if nx < 0 or nx >= width:
+                                ok = False
+                                break
+                            n = nz * width + nx
+                            if not raw[n] or abs(heights[n] - h) > self.max_step * max(abs(nx - cx), abs(nz - cz)):
+                                ok = False
+                                break
+                self.walkable[i] = ok and not self.blocked[i]
+
+    def _link(self, x0, z0, x1, z1):
+        for cz in range(z0, z1):
+            for cx in range(x0, x1):
+                i = cz * self.width + cx
+                self.links[i] = tuple(self.neighbors(i)) if self.walkable[i] else ()
+
+    def _find_entrances(self):
+        """Cell pairs straddling tile borders, one from the middle of each open run."""
+        width = self.width
+        pairs = []
+        for cut in range(TILE_SIZE, self.width, TILE_SIZE):
+            self._border_runs(pairs, [(z * width + cut - 1, z * width + cut) for z in range(self.depth)])
+        for cut in range(TILE_SIZE, self.depth, TILE_SIZE):
+            self._border_runs(pairs, [((cut - 1) * width + x, cut * width + x) for x in range(self.width)])
+        return pairs
+
+    def _border_runs(self, pairs, candidates):
+        run = []
+        for k, (a, b) in enumerate(candidates):
+            if self.walkable[a] and self.walkable[b] and abs(self.heights[a] - self.heights[b]) <= self.max_step:
+                run.append((a, b))
+            # Runs also end where the border crosses into the next tile
+            if run and (k + 1 == len(candidates) or (k + 1) % TILE_SIZE == 0 or run[-1] != (a, b)):
+                pairs.append(run[len(run) // 2])
+                run = []
+
+    def _build_graph(self, dirty):
+        pairs = self._find_entrances()
+        tile_nodes = {}
+        for pair in pairs:
+            for cell in pair:
+                tile_nodes.setdefault(self.tile_of(cell), set()).add(cell)
+
+        tile_edges = {}
+        for tile, nodes in tile_nodes.items():
+            nodes = tile_nodes[tile] = frozenset(nodes)
+            if tile not in dirty and self.tile_nodes.get(tile) == nodes:
+                tile_edges[tile] = self.tile_edges[tile]
+                continue
+            edges = {}
+            for node in nodes:
+                dist, _ = self.local_search(node)
+                edges[node] = {other: dist[other] for other in nodes if other != node and other in dist}
+            tile_edges[tile] = edges
+
+        self.tile_nodes, self.tile_edges = tile_nodes, tile_edges
+        self._assemble_graph(pairs)
+
+    def _assemble_graph(self, pairs):
+        graph = {}
+        for edges in self.tile_edges.values():
+            for node, links in edges.items():
+                graph.setdefault(node, {}).update(links)
+        for a, b in pairs:
+            graph.setdefault(a, {})[b] = 1.0
+            graph.setdefault(b, {})[a] = 1.0
+        self.graph = graph
+
+    # ---------- Queries ----------
+    def cell_of(self, x, z, clamp=False):
+        cx = int((x - self.bounds[0]) // self.cell_size)
+        cz = int((z - self.bounds[1]) // self.cell_size)
+        if clamp:
+            cx = max(0, min(self.width - 1, cx))
+            cz = max(0, min(self.depth - 1, cz))
+        return cx, cz
+
+    def index_of(self, x, z):
+        cx, cz = self.cell_of(x, z)
+        if 0 <= cx < self.width and 0 <= cz < self.depth:
+            return cz * self.width + cx
+        return None
+
+    def tile_of(self, i):
+        cz, cx = divmod(i, self.width)
+        return cx // TILE_SIZE, cz // TILE_SIZE
+
+    def point_of(self, i):
+        """World-space centre of cell i, on its walking surface."""
+        cz, cx = divmod(i, self.width)
+        return (self.bounds[0] + (cx + 0.5) * self.cell_size,
+                self.heights[i],
+                self.bounds[1] + (cz + 0.5) * self.cell_size)
+
+    def neighbors(self, i):
+        """Walkable cells reachable from cell i in one step, with step cost in cells."""
+        width, walkable, heights = self.width, self.walkable, self.heights
+        cz, cx = divmod(i, width)
+        h = heights[i]
+        for dx, dz, cost in _NEIGHBORS:
+            nx, nz = cx + dx, cz + dz
+            if nx < 0 or nz < 0 or nx >= width or nz >= self.depth:
+                continue
+            n = nz * width + nx
+            if not walkable[n] or abs(heights[n] - h) > self.max_step:
+                continue
+            # No cutting corners past obstacles
+            if dx and dz and not (walkable[cz * width + nx] and walkable[nz * width + cx]):
+                continue
+            yield n, cost
+
+    def local_search(self, start):
+        """Dijkstra from a cell without leaving its tile. Returns (dist, parent) dicts."""
+        tx, tz = self.tile_of(start)
+        x0, z0 = tx * TILE_SIZE, tz * TILE_SIZE
+        x1, z1 = x0 + TILE_SIZE, z0 + TILE_SIZE
+        width = self.width
+        dist = {start: 0.0}
+        parent = {start: None}
+        frontier = [(0.0, start)]
+        while frontier:
+            d, i = heapq.heappop(frontier)
+            if d > dist[i]:
+                continue
+            for n, step in self.links[i]:
+                nz, nx = divmod(n, width)
+                if nx < x0 or nx >= x1 or nz < z0 or nz >= z1:
+                    continue
+                nd = d + step
+                if nd < dist.get(n, math.inf):
+                    dist[n] = nd
+                    parent[n] = i
+                    heapq.heappush(frontier, (nd, n))
+        return dist, parent
+
+    # ---------- Serialization ----------
+    def save(self, path):
+        edges = [(a, b, cost) for tile in self.tile_edges.values()
+                 for a, links in tile.items() for b, cost in links.items()]
+        with open(path, 'wb') as f:
+            f.write(_NAV_HEADER.pack(NAV_MAGIC, NAV_VERSION, *self.bounds, self.cell_size,
+                                     self.agent_height, self.agent_radius, self.max_step,
+                                     self.width, self.depth))
+            f.write(struct.pack('<I', len(self.colliders)))
+            for c in self.colliders:
+                f.write(struct.pack('<6f', *c))
+            f.write(self.heights.tobytes())
+            f.write(self.raw)
+            f.write(self.walkable)
+            f.write(struct.pack('<I', len(edges)))
+            for edge in edges:
+                f.write(_EDGE.pack(*edge))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, *values = _NAV_HEADER.unpack_from(data, 0)
+        if magic != NAV_MAGIC or version != NAV_VERSION:
+            raise ValueError(f"'{path}' is not a version {NAV_VERSION} navmesh")
+        navmesh = cls(values[:4], *values[4:8])
+
+        offset = _NAV_HEADER.size
+        (count,) = struct.unpack_from('<I', data, offset)
+        offset += 4
+        navmesh.colliders = [struct.unpack_from('<6f', data, offset + 24 * k) for k in range(count)]
+        offset += 24 * count
+
+        cells = navmesh.width * navmesh.depth
+        navmesh.heights = array('f')
+        navmesh.heights.frombytes(data[offset:offset + 4 * cells])
+        offset += 4 * cells
+        navmesh.raw = bytearray(data[offset:offset + cells])
+        offset += cells
+        navmesh.walkable = bytearray(data[offset:offset + cells])
+        offset += cells
+        navmesh._link(0, 0, navmesh.width, navmesh.depth)
+
+        (count,) = struct.unpack_from('<I', data, offset)
+        offset += 4
+        for a, b, cost in _EDGE.iter_unpack(data[offset:offset + _EDGE.size * count]):
+            navmesh.tile_edges.setdefault(navmesh.tile_of(a), {}).setdefault(a, {})[b] = cost
+        # Entrances are cheap to find again; only the in-tile costs are stored
+        pairs = navmesh._find_entrances()
+        for pair in pairs:
+            for cell in pair:
+                navmesh.tile_nodes.setdefault(navmesh.tile_of(cell), set()).add(cell)
+        navmesh.tile_nodes = {tile: frozenset(nodes) for tile, nodes in navmesh.tile_nodes.items()}
+        for tile, nodes in navmesh.tile_nodes.items():
+            edges = navmesh.tile_edges.setdefault(tile, {})
+            for node in nodes:
+                edges.setdefault(node, {})
+        navmesh._assemble_graph(pairs)
+        return navmesh
+
+
+# -----------------------------------------------------------
+# Pathfinding
+# -----------------------------------------------------------
+class PathFinder:
+    """
+    Hierarchical pathfinder over a NavMesh. A query walks from the start
+    cell to the entrances of its tile, searches the coarse entrance graph
+    with A*, then stitches cell paths back together. Inside a tile,
+    straight lines are used whenever they are clear; only blocked tiles pay
+    for a cell-level search.
+
+    Goals shared by several queries of a batch get a goal field instead (a
+    Dijkstra over the whole coarse graph, cached per goal), so those agents
+    only pay for their own start tile. Finished paths go into an LRU cache.
+    Caches reset when the navmesh is rebuilt.
+    """
+    FIELD_MIN_QUERIES = 4          # queries a goal needs in one batch to get a goal field
+
+    def __init__(self, navmesh, cache_size=4096, field_cache_size=32):
+        self.navmesh = navmesh
+        self.cache_size = cache_size
+        self.field_cache_size = field_cache_size
+        self.paths = OrderedDict()
+        self.fields = OrderedDict()
+        self.trees = {}
+        self.reach = {}
+        self.generation = navmesh.generation
+
+    def _check_generation(self):
+        if self.generation != self.navmesh.generation:
+            self.paths.clear()
+            self.fields.clear()
+            self.trees.clear()
+            self.reach.clear()
+            self.generation = self.navmesh.generation
+
+    def find_path(self, start, goal):
+        """List of world-space waypoints from start to goal (x, y, z), or None."""
+        return self.find_paths(((start, goal),))[0]
+
+    def find_paths(self, queries):
+        """Batched find_path() for a list of (start, goal) pairs; results keep query order."""
+        self._check_generation()
+        cells = [self._cells(start, goal) for start, goal in queries]
+        goal_counts = self._goal_counts(cells)
+        return [self._lookup(pair, goal_counts) for pair in cells]
+
+    def _cells(self, start, goal):
+        nav = self.navmesh
+        s, g = nav.index_of(start[0], start[2]), nav.index_of(goal[0], goal[2])
+        if s is None or g is None or not nav.walkable[s] or not nav.walkable[g]:
+            return None
+        return s, g
+
+    def _goal_counts(self, cells):
+        goal_counts = {}
+        for pair in cells:
+            if pair is not None:
+                goal_counts[pair[1]] = goal_counts.get(pair[1], 0) + 1
+        return goal_counts
+
+    def _lookup(self, pair, goal_counts):
+        if pair is None:
+            return None
+        path = self.paths.get(pair, False)
+        if path is False:
+            path = self._route(*pair, use_field=goal_counts[pair[1]] >= self.FIELD_MIN_QUERIES)
+            self.paths[pair] = path
+            if len(self.paths) > self.cache_size:
+                self.paths.popitem(last=False)
+        else:
+            self.paths.move_to_end(pair)
+        return path
+
+    def _route(self, s, g, use_field=False):
+        nav = self.navmesh
+        if s == g or self._clear_line(s, g):
+            return self._waypoints([s, g] if s != g else [s])
+
+        if nav.tile_of(s) == nav.tile_of(g):
+            dist, parent = self._tree(g)
+            if s in dist:
+                # Connected inside the shared tile
+                return self._waypoints(self._climb(parent, s))
+
+        start_reach = self._reach(s)
+        if use_field or g in self.fields:
+            dist, toward = self._goal_field(g)
+            best, best_cost = None, math.inf
+            for node, cost in start_reach.items():
+                if node in dist and cost + dist[node] < best_cost:
+                    best, best_cost = node, cost + dist[node]
+            if best is None:
+                return None
+            entrances = [best]
+            while toward[entrances[-1]] is not None:
+                entrances.append(toward[entrances[-1]])
+        else:
+            entrances = self._coarse_search(start_reach, self._reach(g), g)
+            if entrances is None:
+                return None
+
+        cells = self._segment(s, entrances[0])
+        for node, following in zip(entrances, entrances[1:]):
+            if nav.tile_of(node) == nav.tile_of(following):
+                cells.extend(self._segment(node, following)[1:])
+            else:
+                cells.append(following)
+        cells.extend(self._segment(entrances[-1], g)[1:])
+        return self._waypoints(cells)
+
+    def _octile(self, a, b):
+        width = self.navmesh.width
+        az, ax = divmod(a, width)
+        bz, bx = divmod(b, width)
+        dx, dz = abs(ax - bx), abs(az - bz)
+        return max(dx, dz) + (math.sqrt(2) - 1) * min(dx, dz)
+
+    def _reach(self, cell):
+        """Walking cost from a cell to each entrance of its tile it can reach inside the tile."""
+        reach = self.reach.get(cell)
+        if reach is not None:
+            return reach
+        nav = self.navmesh
+        nodes = nav.tile_nodes.get(nav.tile_of(cell), ())
+        # A clear straight line costs the octile distance, which is optimal
+        reach = {}
+        for node in nodes:
+            if not self._clear_line(cell, node):
+                dist = self._tree(cell)[0]
+                reach = {n: dist[n] for n in nodes if n in dist}
+                break
+            reach[node] = self._octile(cell, node)
+        self.reach[cell] = reach
+        return reach
+
+    def _segment(self, a, b):
+        """Cells from a to b inside their tile."""
+        cells = []
+        if self._clear_line(a, b, cells):
+            return cells
+        return self._climb(self._tree(b)[1], a)
+
+    def _coarse_search(self, start_reach, goal_reach, g):
+        """A* over the entrance graph; returns the entrances from the start tile to the goal tile."""
+        graph = self.navmesh.graph
+        dist, parent = {}, {}
+        frontier = []
+        for node, cost in start_reach.items():
+            dist[node] = cost
+            parent[node] = None
+            frontier.append((cost + self._octile(node, g), cost, node))
+        heapq.heapify(frontier)
+
+        best, best_cost = None, math.inf
+        while frontier:
+            f, d, i = heapq.heappop(frontier)
+            if f >= best_cost:
+                break
+            if d > dist[i]:
+                continue
+            if i in goal_reach and d + goal_reach[i] < best_cost:
+                best, best_cost = i, d + goal_reach[i]
+            for n, step in graph.get(i, {}).items():
+                nd = d + step
+                if nd < dist.get(n, math.inf):
+                    dist[n] = nd
+                    parent[n] = i
+                    heapq.heappush(frontier, (nd + self._octile(n, g), nd, n))
+        if best is None:
+            return None
+        entrances = self._climb(parent, best)
+        entrances.reverse()
+        return entrances
+
+    def _tree(self, cell):
+        # In-tile search trees, shared by every path that passes this cell
+        tree = self.trees.get(cell)
+        if tree is None:
+            tree = self.trees[cell] = self.navmesh.local_search(cell)
+        return tree
+
+    def _climb(self, parent, cell):
+        """Cells from 'cell' up a search tree to its root."""
+        cells = []
+        while cell is not None:
+            cells.append(cell)
+            cell = parent[cell]
+        return cells
+
+    def _goal_field(self, g):
+        field = self.fields.get(g)
+        if field is not None:
+            self.fields.move_to_end(g)
+            return field
+        graph = self.navmesh.graph
+        dist, toward = {}, {}
+        frontier = []
+        for node, cost in self._reach(g).items():
+            dist[node] = cost
+            toward[node] = None
+            frontier.append((cost, node))
+        heapq.heapify(frontier)
+        while frontier:
+            d, i = heapq.heappop(frontier)
+            if d > dist[i]:
+                continue
+            for n, step in graph.get(i, {}).items():
+                nd = d + step
+                if nd < dist.get(n, math.inf):
+                    dist[n] = nd
+                    toward[n] = i
+                    heapq.heappush(frontier, (nd, n))
+
+        field = self.fields[g] = (dist, toward)
+        if len(self.fields) > self.field_cache_size:
+            self.fields.popitem(last=False)
+        return field
+
+    def _clear_line(self, s, g, cells=None):
+        """
+        True if every cell on the straight line s-g can be walked in
+        sequence. The cells are appended to 'cells' if given.
+        """
+        nav = self.navmesh
+        width, walkable, heights = nav.width, nav.walkable, nav.heights
+        sz, sx = divmod(s, width)
+        gz, gx = divmod(g, width)
+        dx, dz = gx - sx, gz - sz
+        steps = max(abs(dx), abs(dz))
+        px, pz, prev = sx, sz, s
+        if cells is not None:
+            cells.append(s)
+        for k in range(1, steps + 1):
+            # Integer rounding of the k-th point along the line
+            x = sx + (2 * dx * k + steps) // (2 * steps)
+            z = sz + (2 * dz * k + steps) // (2 * steps)
+            i = z * width + x
+            if not walkable[i] or abs(heights[i] - heights[prev]) > nav.max_step:
+                return False
+            # Diagonal moves must not squeeze between two blocked cells
+            if x != px and z != pz and not (walkable[pz * width + x] and walkable[z * width + px]):
+                return False
+            px, pz, prev = x, z, i
+            if cells is not None:
+                cells.append(i)
+        return True
+
+    def _waypoints(self, cells):
+        # Keep only the cells where the path changes direction...
+        kept = cells[:1]
+        for prev, cur, nxt in zip(cells, cells[1:], cells[2:]):
+            if cur - prev != nxt - cur:
+                kept.append(cur)
+        if len(cells) > 1:
+            kept.append(cells[-1])
+        # ...then jump to the furthest corner a straight line reaches. The
+        # search gallops out and bisects back, so long paths cost
+        # O(log n) line checks per waypoint instead of O(n)
+        smooth = kept[:1]
+        k = 0
+        last = len(kept) - 1
+        while k < last:
+            near, step = k + 1, 1
+            far = min(last, k + 2)
+            while far > near and self._clear_line(kept[k], kept[far]):
+                near = far
+                step *= 2
+                far = min(last, k + 1 + step)
+            while far - near > 1:
+                middle = (near + far) // 2
+                if self._clear_line(kept[k], kept[middle]):
+                    near = middle
+                else:
+                    far = middle
+            smooth.append(kept[near])
+            k = near
+        return [self.navmesh.point_of(i) for i in smooth]
+
+
+class PathQueue:
+    """
+    Spreads path queries over frames. submit() only queues a query; each
+    update() answers queued queries until budget_ms is spent and hands
+    every path (or None) to its callback. Cached paths cost microseconds,
+    but a cold batch of hundreds of agents takes longer than one frame.
+    """
+    def __init__(self, finder, budget_ms=2.0):
+        self.finder = finder
+        self.budget = budget_ms / 1000
+        self.pending = []
+
+    def submit(self, start, goal, callback):
+        self.pending.append((start, goal, callback))
+
+    def update(self):
+        if not self.pending:
+            return
+        finder = self.finder
+        finder._check_generation()
+        deadline = time.perf_counter() + self.budget
+        # Goals are counted over the whole queue so shared goals still get a goal field
+        cells = [finder._cells(start, goal) for start, goal, _ in self.pending]
+        goal_counts = finder._goal_counts(cells)
+        done = 0
+        for pair, (_, _, callback) in zip(cells, self.pending):
+            callback(finder._lookup(pair, goal_counts))
+            done += 1
+            if time.perf_counter() > deadline:
+                break
+        del self.pending[:done]
+
+
+# -----------------------------------------------------------
+# Benchmark
+# -----------------------------------------------------------
+def benchmark(agents=300, goals=4, seed=0):
+    import random
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    navmesh = NavMesh()
+    navmesh.bake(station_colliders())
+    print(f"bake: {(time.perf_counter() - start) * 1000:.1f} ms, "
+          f"{sum(navmesh.walkable)} walkable cells, {len(navmesh.graph)} entrances")
+
+    start = time.perf_counter()
+    navmesh.rebuild_zone(box((0, 3.5, 20), (3, 7, 1)))
+    print(f"rebuild one zone (door): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    path = os.path.join(tempfile.gettempdir(), 'station.navmesh')
+    navmesh.save(path)
+    start = time.perf_counter()
+    navmesh = NavMesh.load(path)
+    print(f"load from '{path}': {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    ground = [navmesh.point_of(i) for i in range(len(navmesh.walkable))
+              if navmesh.walkable[i] and navmesh.heights[i] == 0.0]
+    goal_points = rng.sample(ground, goals)
+    queries = [(rng.choice(ground), rng.choice(goal_points)) for _ in range(agents)]
+
+    finder = PathFinder(navmesh)
+    singles = [(rng.choice(ground), rng.choice(ground)) for _ in range(50)]
+    start = time.perf_counter()
+    found = sum(finder.find_path(s, g) is not None for s, g in singles)
+    print(f"single cold queries: {(time.perf_counter() - start) / len(singles) * 1000:.2f} ms/query, "
+          f"{found}/{len(singles)} found")
+
+    for label in ('cold', 'warm'):
+        start = time.perf_counter()
+        paths = finder.find_paths(queries)
+        elapsed = time.perf_counter() - start
+        found = sum(p is not None for p in paths)
+        print(f"batched {agents} queries to {goals} goals ({label}): {elapsed * 1000:.1f} ms, "
+              f"{elapsed / agents * 1e6:.1f} us/query, {found} found")
+
+    queue = PathQueue(PathFinder(navmesh))
+    answered = []
+    for s, g in queries:
+        queue.submit(s, g, answered.append)
+    frames, worst = 0, 0.0
+    while queue.pending:
+        start = time.perf_counter()
+        queue.update()
+        worst = max(worst, time.perf_counter() - start)
+        frames += 1
+    print(f"queued {agents} cold queries at {queue.budget * 1000:g} ms/frame: "
+          f"{frames} frames, worst frame {worst * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bake the station navmesh and time path queries')
+    parser.add_argument('--agents', type=int, default=300)
+    parser.add_argument('--goals', type=int, default=4)
+    args = parser.parse_args()
+    benchmark(args.agents, args.goals)
@@ -0,0 +1,447 @@
+import argparse
+import atexit
+import math
+import socket
+import struct
+import time
+
+
+# -----------------------------------------------------------
+# Shared Settings
+# -----------------------------------------------------------
+DEFAULT_PORT = 27960
+TICK_RATE = 20                 # snapshots per second
+POS_SCALE = 100                # positions are sent in centimetres (int16, +-327 m)
+ROT_SCALE = 65536 / 360        # yaw is sent as uint16
+INTEREST_RADIUS = 60           # players further than this are not sent to a client
+SNAPSHOT_HISTORY = 32          # ticks of sent views kept per client for delta baselines
+INTERP_TICKS = 2               # clients render this many ticks in the past
+CLIENT_TIMEOUT = 5.0
+MAX_PACKET = 60000
+
+PLAYER, TRAIN, DOOR = 0, 1, 2
+
+# Packet types
+HELLO, WELCOME, INPUT, SNAPSHOT, BYE = b'H', b'W', b'I', b'S', b'B'
+
+# Snapshot entry field mask. An entry carries only the fields that differ
+# from the baseline the client acknowledged; REMOVED drops the entity.
+F_KIND, F_X, F_Y, F_Z, F_ROT, F_FLAGS = 1, 2, 4, 8, 16, 32
+F_REMOVED = 128
+_FIELDS = ((F_KIND, 'B'), (F_X, 'h'), (F_Y, 'h'), (F_Z, 'h'), (F_ROT, 'H'), (F_FLAGS, 'B'))
+_FIELD_STRUCTS = [(bit, struct.Struct('<' + fmt)) for bit, fmt in _FIELDS]
+
+_WELCOME = struct.Struct('<HB')        # player id, tick rate
+_INPUT = struct.Struct('<IIhhhH')      # seq, ack tick, x, y, z, rot
+_SNAP_HEADER = struct.Struct('<IIH')   # tick, baseline tick (0 = full), entries
+_ENTRY = struct.Struct('<HB')          # entity id, field mask
+
+
+def quantize_pos(v):
+    return max(-32768, min(32767, int(round(v * POS_SCALE))))
+
+
+def quantize_rot(degrees):
+    return int(round((degrees % 360) * ROT_SCALE)) & 0xFFFF
+
+
+def quantize(kind, x, y, z, rot=0.0, flags=0):
+    """Packs a world-space state into the integer tuple that goes on the wire."""
+    return (kind, quantize_pos(x), quantize_pos(y), quantize_pos(z), quantize_rot(rot), flags)
+
+
+def dequantize(state):
+    kind, x, y, z, rot, flags = state
+    return kind, x / POS_SCALE, y / POS_SCALE, z / POS_SCALE, rot / ROT_SCALE, flags
+
+
+# -----------------------------------------------------------
+# Snapshot Encoding
+# -----------------------------------------------------------
+def encode_snapshot(tick, baseline_tick, view, baseline):
+    """
+    Encodes a client's view ({id: quantized state}) as a delta against
+    the baseline view it acknowledged. Unchanged entities cost nothing.
+    """
+    body = []
+    count = 0
+    for entity_id, state in view.items():
+        old = baseline.get(entity_id)
+        mask = 0
+        for i, (bit, _) in enumerate(_FIELD_STRUCTS):
+            if old is None or old[i] != state[i]:
+                mask |= bit
+        if not mask:
+            continue
+        body.append(_ENTRY.pack(entity_id, mask))
+        for i, (bit, field) in enumerate(_FIELD_STRUCTS):
+            if mask & bit:
+                body.append(field.pack(state[i]))
+        count += 1
+    for entity_id in baseline:
+        if entity_id not in view:
+            body.append(_ENTRY.pack(entity_id, F_REMOVED))
+            count += 1
+    return SNAPSHOT + _SNAP_HEADER.pack(tick, baseline_tick, count) + b''.join(body)
+
+
+def decode_snapshot(data, views):
+    """
+    Rebuilds the full view of a snapshot packet from the baseline in
+    'views' ({tick: view}). Returns (tick, view), or None if the baseline
+    is no longer known and the packet has to be dropped.
+    """
+    tick, baseline_tick, count = _SNAP_HEADER.unpack_from(data, 1)
+    if baseline_tick and baseline_tick not in views:
+        return None
+    view = dict(views[baseline_tick]) if baseline_tick else {}
+    offset = 1 + _SNAP_HEADER.size
+    for _ in range(count):
+        entity_id, mask = _ENTRY.unpack_from(data, offset)
+        offset += _ENTRY.size
+        if mask & F_REMOVED:
+            view.pop(entity_id, None)
+            continue
+        state = list(view.get(entity_id, (0, 0, 0, 0, 0, 0)))
+        for i, (bit, field) in enumerate(_FIELD_STRUCTS):
+            if mask & bit:
+                state[i] = field.unpack_from(data, offset)[0]
+                offset += field.size
+        view[entity_id] = tuple(state)
+    return tick, view
+
+
+# -----------------------------------------------------------
+# Authoritative Server
+# -----------------------------------------------------------
+class ClientSlot:
+    def __init__(self, address, player_id):
+        self.address = address
+        self.player_id = player_id
+        self.ack_tick = 0
+        self.last_seq = 0
+        self.history = {}
+        self.last_heard = time.perf_counter()
+
+
+class StationServer:
+    """
+    Owns the shared station state (players, trains and doors) and sends
+    each client a quantized, delta-compressed snapshot every tick.
+    Trains and doors are simulated here; player poses are reported by
+    clients and clamped to the station and to a maximum speed.
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, interest_radius=INTEREST_RADIUS,
+                 delta=True, interest=True):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+        self.interest_radius = interest_radius
+        self.delta = delta
+        self.interest = interest
+        self.tick = 0
+        self.clients = {}
+        self.next_id = 1
+        self.bytes_sent = 0
+
+        # [kind, x, y, z, rot, flags] per entity id, matching hl3.py
+        self.entities = {}
+        self.train_id = self.spawn(TRAIN, -80, 1.5, 0)
+        self.door_id = self.spawn(DOOR, 0, 3.5, 20)
+
+    def spawn(self, kind, x, y, z, rot=0.0):
+        entity_id = self.next_id
+        self.next_id += 1
+        self.entities[entity_id] = [kind, x, y, z, rot, 0]
+        return entity_id
+
+    def poll(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(MAX_PACKET)
+            except (BlockingIOError, ConnectionResetError):
+                return
+            if not data:
+                continue
+            kind = data[:1]
+            client = self.clients.get(address)
+            if kind == HELLO:
+                if client is None:
+                    client = ClientSlot(address, self.spawn(PLAYER, 0, 1, -10))
+                    self.clients[address] = client
+                self.sock.sendto(WELCOME + _WELCOME.pack(client.player_id, TICK_RATE), address)
+            elif kind == INPUT and client is not None and len(data) >= 1 + _INPUT.size:
+                self.receive_input(client, data)
+            elif kind == BYE and client is not None:
+                self.drop(client)
+
+    def receive_input(self, client, data):
+        seq, ack_tick, qx, qy, qz, qrot = _INPUT.unpack_from(data, 1)
+        client.last_heard = time.perf_counter()
+        if seq <= client.last_seq:
+            return
+        client.last_seq = seq
+        if ack_tick in client.history:
+            client.ack_tick = ack_tick
+
+        player = self.entities[client.player_id]
+        x, y, z = qx / POS_SCALE, qy / POS_SCALE, qz / POS_SCALE
+        # Players can not move faster than a sprint or leave the station
+        max_step = 20 / TICK_RATE
+        player[1] += max(-max_step, min(max_step, x - player[1]))
+        player[2] = max(0, min(20, y))
+        player[3] += max(-max_step, min(max_step, z - player[3]))
+        player[1] = max(-99, min(99, player[1]))
+        player[3] = max(-99, min(99, player[3]))
+        player[4] = qrot / ROT_SCALE
+
+    def drop(self, client):
+        self.entities.pop(client.player_id, None)
+        del self.clients[client.address]
+
+    def simulate(self, dt):
+        train = self.entities[self.train_id]
+        train[1] += dt * 8
+        if train[1] > 50:
+            train[1] = -80
+
+        door = self.entities[self.door_id]
+        for kind, x, y, z, rot, flags in self.entities.values():
+            if kind == PLAYER and abs(z - door[3]) < 5 and abs(x - door[1]) < 3:
+                door[2] = min(7, door[2] + dt * 2)
+                door[5] = 1
+                break
+
+    def view_for(self, client, quantized):
+        """
+        Quantized states of every entity the client should see. Trains and
+        doors are visible across the whole station and are always sent;
+        other players only within the interest radius.
+        """
+        me = self.entities[client.player_id]
+        radius_sq = self.interest_radius ** 2
+        view = {}
+        for entity_id, state in self.entities.items():
+            if entity_id == client.player_id:
+                continue
+            dx, dz = state[1] - me[1], state[3] - me[3]
+            if self.interest and state[0] == PLAYER and dx * dx + dz * dz > radius_sq:
+                continue
+            view[entity_id] = quantized[entity_id]
+        return view
+
+    def step(self, dt=1 / TICK_RATE):
+        """Runs one server tick: read inputs, simulate, send snapshots."""
+        self.poll()
+        self.simulate(dt)
+        self.tick += 1
+
+        now = time.perf_counter()
+        quantized = {entity_id: quantize(*state) for entity_id, state in self.entities.items()}
+        for client in list(self.clients.values()):
+            if now - client.last_heard > CLIENT_TIMEOUT:
+                self.drop(client)
+                continue
+            view = self.view_for(client, quantized)
+            baseline_tick = client.ack_tick if self.delta else 0
+            if baseline_tick not in client.history:
+                # The acked view has been pruned (e.g. the client hitched for
+                # longer than SNAPSHOT_HISTORY ticks): start over from a full
+                # snapshot, which also drops entities the client still shows
+                baseline_tick = client.ack_tick = 0
+            baseline = client.history[baseline_tick] if baseline_tick else {}
+            packet = encode_snapshot(self.tick, baseline_tick, view, baseline)
+            self.sock.sendto(packet, client.address)
+            self.bytes_sent += len(packet)
+
+            client.history[self.tick] = view
+            for old_tick in [t for t in client.history if t < client.ack_tick or t <= self.tick - SNAPSHOT_HISTORY]:
+                del client.history[old_tick]
+
+    def serve_forever(self):
+        print(f"Station server listening on {self.address[0]}:{self.address[1]}")
+        interval = 1 / TICK_RATE
+        next_tick = time.perf_counter()
+        while True:
+            self.step(interval)
+            next_tick += interval
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+
+# -----------------------------------------------------------
+# Client
+# -----------------------------------------------------------
+class NetClient:
+    """
+    Sends the local player's pose to the server and keeps the snapshots
+    it receives. interpolated() returns every remote entity blended
+    between the two snapshots around the render time.
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.server = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.player_id = None
+        self.tick_rate = TICK_RATE
+        self.seq = 0
+        self.last_send = 0.0
+        self.views = {}
+        self.latest_tick = 0
+        self.render_tick = 0.0
+        self.bytes_received = 0
+        self.sock.sendto(HELLO, self.server)
+        # Say BYE on exit so the server drops our player now, not after CLIENT_TIMEOUT
+        atexit.register(self.close)
+
+    def send_pose(self, x, y, z, rot_y, force=False):
+        # Inputs are sent at the server tick rate, not every rendered frame;
+        # force skips the throttle for callers that tick on simulated time
+        now = time.perf_counter()
+        if not force and now - self.last_send < 1 / self.tick_rate:
+            return
+        self.last_send = now
+        if self.player_id is None:
+            self.sock.sendto(HELLO, self.server)
+            return
+        self.seq += 1
+        self.sock.sendto(INPUT + _INPUT.pack(self.seq, self.latest_tick, quantize_pos(x),
+                                             quantize_pos(y), quantize_pos(z), quantize_rot(rot_y)),
+                         self.server)
+
+    def poll(self):
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(MAX_PACKET)
+            except (BlockingIOError, ConnectionResetError):
+                return
+            self.bytes_received += len(data)
+            kind = data[:1]
+            if kind == WELCOME:
+                self.player_id, self.tick_rate = _WELCOME.unpack_from(data, 1)
+            elif kind == SNAPSHOT:
+                decoded = decode_snapshot(data, self.views)
+                if decoded is None or decoded[0] <= self.latest_tick:
+                    continue
+                tick, view = decoded
+                self.views[tick] = view
+                self.latest_tick = tick
+                for old_tick in [t for t in self.views if t <= tick - SNAPSHOT_HISTORY]:
+                    del self.views[old_tick]
+
+    def interpolated(self, dt):
+        """
+        Advances the render clock by dt seconds and returns
+        {id: (kind, x, y, z, rot, flags)} at INTERP_TICKS behind the newest snapshot.
+        """
+        if not self.views:
+            return {}
+        target = self.latest_tick - INTERP_TICKS
+        self.render_tick += dt * self.tick_rate
+        # Snap back into the buffered window if we drifted too far ahead or behind
+        if abs(self.render_tick - target) > INTERP_TICKS:
+            self.render_tick = float(target)
+        self.render_tick = min(self.render_tick, float(self.latest_tick))
+
+        older = [t for t in self.views if t <= self.render_tick]
+        newer = [t for t in self.views if t > self.render_tick]
+        if not older:
+            return {i: dequantize(s) for i, s in self.views[min(self.views)].items()}
+        a = max(older)
+        if not newer:
+            return {i: dequantize(s) for i, s in self.views[a].items()}
+        b = min(newer)
+        t = (self.render_tick - a) / (b - a)
+
+        result = {}
+        view_a, view_b = self.views[a], self.views[b]
+        for entity_id, state_b in view_b.items():
+            state_a = view_a.get(entity_id)
+            kind, xb, yb, zb, rb, flags = dequantize(state_b)
+            if state_a is None:
+                result[entity_id] = (kind, xb, yb, zb, rb, flags)
+                continue
+            _, xa, ya, za, ra, _ = dequantize(state_a)
+            turn = (rb - ra + 180) % 360 - 180
+            result[entity_id] = (kind, xa + (xb - xa) * t, ya + (yb - ya) * t,
+                                 za + (zb - za) * t, ra + turn * t, flags)
+        return result
+
+    def close(self):
+        if self.sock.fileno() == -1:
+            return
+        if self.player_id is not None:
+            self.sock.sendto(BYE, self.server)
+        self.sock.close()
+
+
+def client_from_argv(argv=None):
+    """Returns a NetClient if '--connect host:port' was given on the command line, else None."""
+    import sys
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--connect')
+    args, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    if not args.connect:
+        return None
+    host, _, port = args.connect.partition(':')
+    return NetClient(host or '127.0.0.1', int(port or DEFAULT_PORT))
+
+
+# -----------------------------------------------------------
+# Benchmark
+# -----------------------------------------------------------
+def benchmark(client_counts=(1, 8, 16, 32, 64), ticks=200):
+    """
+    Runs a server with simulated clients walking around the station over
+    localhost UDP and reports server tick cost and bytes per client per
+    tick, with delta compression and interest culling each on and off.
+    The bots send one pose (and ack) per server tick on simulated time,
+    so the results do not depend on how fast the machine runs the ticks.
+    """
+    modes = (('full', False, False), ('interest', False, True), ('delta', True, False), ('both', True, True))
+    print(f"{'clients':>8} {'mode':>9} {'tick ms':>9} {'B/client/tick':>14} {'kbit/s/client':>14}")
+    for count in client_counts:
+        for name, delta, interest in modes:
+            server = StationServer(port=0, delta=delta, interest=interest)
+            host, port = server.address
+            clients = [NetClient(host, port) for _ in range(count)]
+            server.poll()
+            for client in clients:
+                client.poll()
+
+            tick_time = 0.0
+            for tick in range(ticks):
+                for i, client in enumerate(clients):
+                    # Bots walk circles spread over the station; half stand still
+                    angle = tick / TICK_RATE * 0.5 + i
+                    radius = 5 + (i * 7) % 80 if i % 2 else 0
+                    cx, cz = ((i * 37) % 180) - 90, ((i * 53) % 180) - 90
+                    client.send_pose(cx + math.cos(angle) * radius * 0.1, 1, cz + math.sin(angle) * radius * 0.1,
+                                     angle * 57.3, force=True)
+                start = time.perf_counter()
+                server.step()
+                tick_time += time.perf_counter() - start
+                for client in clients:
+                    client.poll()
+
+            per_client = server.bytes_sent / ticks / count
+            print(f"{count:>8} {name:>9} {tick_time / ticks * 1000:>9.3f} "
+                  f"{per_client:>14.1f} {per_client * TICK_RATE * 8 / 1000:>14.1f}")
+            for client in clients:
+                client.close()
+            server.sock.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Station multiplayer server')
+    parser.add_argument('mode', choices=('server', 'bench'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--clients', type=int, nargs='*', default=[1, 8, 16, 32, 64])
+    parser.add_argument('--ticks', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.mode == 'server':
+        StationServer(args.host, args.port).serve_forever()
+    else:
+        benchmark(args.clients, args.ticks)
@@ -0,0 +1,70 @@
+import argparse
+import os
+import sys
+
+# -----------------------------------------------------------
+# Quality Presets
+# -----------------------------------------------------------
+# The scene scripts read every performance-relevant setting from the
+# active preset instead of hard-coding it. The tier comes from
+# '--quality <tier>' on the command line or the HL3_QUALITY environment
+# variable (set by launcher.py), and defaults to 'high', which matches
+# the values the scripts used before presets existed.
+QUALITY_ENV = 'HL3_QUALITY'
+DEFAULT_TIER = 'high'
+
+
+class QualityPreset:
+    """One named set of rendering knobs."""
+    def __init__(self, name, shadows, shadow_resolution, max_point_lights, tessellation,
+                 post_processing, window_size, vsync, fps_counter):
+        self.name = name
+        self.shadows = shadows
+        self.shadow_resolution = shadow_resolution  # side of the square shadow map
+        self.max_point_lights = max_point_lights
+        self.tessellation = tessellation          # ground grid subdivisions per side
+        self.post_processing = post_processing
+        self.window_size = window_size            # None keeps each script's own size
+        self.vsync = vsync
+        self.fps_counter = fps_counter
+
+    def window_options(self):
+        """Keyword arguments for Ursina(); vsync can only be set before the window opens."""
+        options = {'vsync': self.vsync}
+        if self.window_size:
+            options['size'] = self.window_size
+        return options
+
+    def __repr__(self):
+        return f'QualityPreset({self.name!r})'
+
+
+PRESETS = {
+    'low': QualityPreset('low', shadows=False, shadow_resolution=512, max_point_lights=1, tessellation=50,
+                         post_processing=False, window_size=(1280, 720), vsync=True, fps_counter=False),
+    'medium': QualityPreset('medium', shadows=True, shadow_resolution=1024, max_point_lights=2, tessellation=100,
+                            post_processing=False, window_size=(1600, 900), vsync=True, fps_counter=False),
+    'high': QualityPreset('high', shadows=True, shadow_resolution=2048, max_point_lights=4, tessellation=200,
+                          post_processing=True, window_size=None, vsync=True, fps_counter=True),
+    # Same load as high at a fixed size, uncapped, so frame times compare across machines
+    'benchmark': QualityPreset('benchmark', shadows=True, shadow_resolution=2048, max_point_lights=4, tessellation=200,
+                               post_processing=True, window_size=(1280, 720), vsync=False, fps_counter=True),
+}
+
+# Tiers auto-detect may pick, best first
+AUTO_TIERS = ('high', 'medium', 'low')
+
+
+def selected_tier(argv=None):
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--quality')
+    args, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    tier = args.quality or os.environ.get(QUALITY_ENV) or DEFAULT_TIER
+    if tier not in PRESETS:
+        raise ValueError(f"Unknown quality tier '{tier}', expected one of: {', '.join(PRESETS)}")
+    return tier
+
+
+def active():
+    """The preset the current process should run with."""
+    return PRESETS[selected_tier()]
@@ -0,0 +1,237 @@
+import argparse
+import atexit
+import struct
+import sys
+import time
+
+from ursina import Entity, Vec3, application, mouse
+
+
+# -----------------------------------------------------------
+# Log Format
+# -----------------------------------------------------------
+# A replay log is a small header followed by one record per frame:
+#
+#   header : magic 'HL3R', uint16 version
+#   frame  : float32 dt, float32 mouse_vx, float32 mouse_vy, uint8 n_events
+#   event  : uint8 key_id  (0xFF = new key, followed by uint8 len + utf-8 name)
+#
+# Key names are interned on first use, so a typical frame is 13 bytes.
+LOG_MAGIC = b'HL3R'
+LOG_VERSION = 1
+NEW_KEY = 0xFF
+
+_HEADER = struct.Struct('<4sH')
+_FRAME = struct.Struct('<fffB')
+
+
+class InputRecorder(Entity):
+    """
+    Captures every input event, the mouse velocity and the timestep of
+    each frame to a compact binary log.
+    Create it after the scene so its update() runs last in the frame.
+    """
+    def __init__(self, path, **kwargs):
+        super().__init__(ignore_paused=True, eternal=True, **kwargs)
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(_HEADER.pack(LOG_MAGIC, LOG_VERSION))
+        self.key_ids = {}
+        self.pending = []
+        self.frames = 0
+        atexit.register(self.close)
+
+    def input(self, key):
+        # Events beyond 255 in one frame are dropped rather than corrupting the log
+        if len(self.pending) < 255:
+            self.pending.append(key)
+
+    def update(self):
+        self.file.write(_FRAME.pack(time.dt, mouse.velocity[0], mouse.velocity[1], len(self.pending)))
+        for key in self.pending:
+            self.write_key(key)
+        self.pending.clear()
+        self.frames += 1
+
+    def write_key(self, key):
+        if key in self.key_ids:
+            self.file.write(bytes((self.key_ids[key],)))
+            return
+        name = key.encode('utf-8')[:255]
+        if len(self.key_ids) < NEW_KEY:
+            self.key_ids[key] = len(self.key_ids)
+        self.file.write(bytes((NEW_KEY, len(name))) + name)
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.close()
+        print(f"Recorded {self.frames} frames to '{self.path}'")
+
+
+def load_log(path):
+    """
+    Reads a replay log into a list of (dt, mouse_vx, mouse_vy, keys) frames.
+    A log cut off mid-frame (e.g. a killed recording) ends at the last complete frame.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    magic, version = _HEADER.unpack_from(data, 0)
+    if magic != LOG_MAGIC or version != LOG_VERSION:
+        raise ValueError(f"'{path}' is not a version {LOG_VERSION} replay log")
+
+    frames = []
+    key_names = []
+    offset = _HEADER.size
+    while offset + _FRAME.size <= len(data):
+        dt, vx, vy, n_events = _FRAME.unpack_from(data, offset)
+        cursor = offset + _FRAME.size
+        keys = []
+        for _ in range(n_events):
+            if cursor >= len(data):
+                break
+            key_id = data[cursor]
+            cursor += 1
+            if key_id == NEW_KEY:
+                if cursor >= len(data) or cursor + 1 + data[cursor] > len(data):
+                    break
+                length = data[cursor]
+                name = data[cursor + 1:cursor + 1 + length].decode('utf-8')
+                cursor += 1 + length
+                if len(key_names) < NEW_KEY:
+                    key_names.append(name)
+                keys.append(name)
+            else:
+                keys.append(key_names[key_id])
+        if len(keys) < n_events:
+            break
+        frames.append((dt, vx, vy, keys))
+        offset = cursor
+    return frames
+
+
+class InputReplayer:
+    """
+    Drives the scene from a recorded log: feeds the recorded timestep,
+    mouse velocity and key events to Ursina before each frame's update.
+    Pass fixed_dt to replay the same inputs at a locked timestep.
+    Wall-clock frame times are collected so runs can be compared between builds.
+    """
+    def __init__(self, app, path, fixed_dt=None, profile_path=None, quit_when_done=True):
+        self.app = app
+        self.frames = load_log(path)
+        self.fixed_dt = fixed_dt
+        self.profile_path = profile_path
+        self.quit_when_done = quit_when_done
+        self.index = 0
+        self.frame_times = []
+        self.last_frame_start = None
+
+        self.calculate_dt = application.calculate_dt
+        application.calculate_dt = False
+        mouse.update = self.update_mouse
+        self.ignore_live_input()
+        # Sort below Ursina's 'update' task (0) so the frame state is set before anything reads it
+        app.taskMgr.add(self.step, 'replay', sort=-1)
+        print(f"Replaying {len(self.frames)} frames from '{path}'")
+
+    def step(self, task):
+        now = time.perf_counter()
+        if self.last_frame_start is not None:
+            self.frame_times.append(now - self.last_frame_start)
+        self.last_frame_start = now
+
+        if self.index >= len(self.frames):
+            self.finish()
+            return task.done
+
+        dt, self.mouse_vx, self.mouse_vy, keys = self.frames[self.index]
+        if self.fixed_dt is not None:
+            dt = self.fixed_dt
+        time.dt_unscaled = dt
+        time.dt = dt
+        for key in keys:
+            self.app.input(key, is_raw=True)
+        self.index += 1
+        return task.cont
+
+    def live_input_handlers(self):
+        """The input events Ursina accepts in Ursina.__init__, as (event, method, extra args)."""
+        from ursina.main import keyboard_keys
+
+        app = self.app
+        handlers = [('buttonDown', app.input, []), ('buttonUp', app.input_up, []),
+                    ('buttonHold', app.input_hold, []), ('keystroke', app.text_input, [])]
+        for key in keyboard_keys:
+            handlers += [(f'raw-{key}', app.input, [key, True]),
+                         (f'raw-{key}-up', app.input_up, [key, True]),
+                         (f'raw-{key}-repeat', app.input_hold, [key, True])]
+        return handlers
+
+    def ignore_live_input(self):
+        # Real key and mouse button presses would change the replayed
+        # workload, so only the recorded events reach app.input
+        for event, _, _ in self.live_input_handlers():
+            self.app.ignore(event)
+
+    def restore_live_input(self):
+        for event, method, extra_args in self.live_input_handlers():
+            self.app.accept(event, method, extra_args)
+
+    def update_mouse(self):
+        mouse.velocity = Vec3(self.mouse_vx, self.mouse_vy, 0)
+
+    def finish(self):
+        # Hand the clock, the mouse and the keyboard back to the player
+        application.calculate_dt = self.calculate_dt
+        del mouse.update
+        self.restore_live_input()
+
+        report = frame_time_report(self.frame_times)
+        print(f"Replay finished: {report}")
+        if self.profile_path:
+            with open(self.profile_path, 'w') as f:
+                f.write('frame,ms\n')
+                for i, frame_time in enumerate(self.frame_times):
+                    f.write(f'{i},{frame_time * 1000:.3f}\n')
+        if self.quit_when_done:
+            application.quit()
+
+
+def frame_time_report(frame_times):
+    """Summarizes wall-clock frame times (seconds) as a one-line string."""
+    if not frame_times:
+        return 'no frames'
+    ordered = sorted(frame_times)
+    mean = sum(ordered) / len(ordered)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return (f"{len(ordered)} frames, avg {mean * 1000:.2f} ms, "
+            f"p99 {p99 * 1000:.2f} ms, worst {ordered[-1] * 1000:.2f} ms")
+
+
+# -----------------------------------------------------------
+# Command Line Hook
+# -----------------------------------------------------------
+def install_from_argv(app, argv=None):
+    """
+    Enables recording or replay from the command line, e.g.:
+        python hl3.py --record run.hl3r
+        python hl3.py --replay run.hl3r --replay-dt 0.0166 --profile-out frames.csv
+    Unknown arguments are left alone. Returns the recorder/replayer, or None.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--record')
+    parser.add_argument('--replay')
+    parser.add_argument('--replay-dt', type=float)
+    parser.add_argument('--profile-out')
+    parser.add_argument('--replay-keep-open', action='store_true')
+    args, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+
+    if args.replay:
+        return InputReplayer(app, args.replay, fixed_dt=args.replay_dt,
+                             profile_path=args.profile_out,
+                             quit_when_done=not args.replay_keep_open)
+    if args.record:
+        return InputRecorder(args.record)
+    return None
@@ -2,15 +2,17 @@ from ursina import *
 from ursina.shaders import lit_with_shadows_shader
 from ursina.prefabs.first_person_controller import FirstPersonController
 from ursina import Material
-import numpy as np
+import math
 import sys
 import time
+import quality
 
 class AdvancedLightingSystem:
     """
     Implements advanced lighting with HDR-like effects
     """
-    def __init__(self, scene_brightness=1.5):
+    def __init__(self, preset, scene_brightness=1.5):
+        self.preset = preset
         self.exposure = 1.0
         self.scene_brightness = scene_brightness
         self.bloom_threshold = 0.8
@@ -21,8 +23,8 @@ class AdvancedLightingSystem:
         self.sun = DirectionalLight(
             y=20, 
             rotation=(45, -45, 0),
-            shadows=True,
-            shadow_resolution=2048
+            shadows=self.preset.shadows,
+            shadow_map_resolution=Vec2(self.preset.shadow_resolution, self.preset.shadow_resolution)
         )
         
         # Ambient lighting for bounce light simulation
@@ -34,10 +36,12 @@ class AdvancedLightingSystem:
         self.point_lights = []
         
     def create_point_light(self, position, color=color.white, intensity=1.0):
+        if len(self.point_lights) >= self.preset.max_point_lights:
+            return None
         light = PointLight(
             position=position,
             color=color * intensity,
-            shadows=True
+            shadows=self.preset.shadows
         )
         self.point_lights.append(light)
         return light
@@ -95,8 +99,9 @@ class EnhancedStation(Entity):
     """
     Enhanced train station with improved visuals
     """
-    def __init__(self, assets, lighting):
+    def __init__(self, assets, lighting, tessellation=200):
         super().__init__()
+        self.tessellation = tessellation
         self.assets = assets
         self.lighting = lighting
         self.create_environment()
@@ -104,8 +109,8 @@ class EnhancedStation(Entity):
     def create_environment(self):
         # Ground plane with tessellation for better shadows
         self.ground = Entity(
-            model=Mesh(vertices=self.generate_tessellated_plane(200, 200),
-                      uvs=self.generate_uvs(200, 200)),
+            model=Mesh(vertices=self.generate_tessellated_plane(self.tessellation, self.tessellation),
+                      uvs=self.generate_uvs(self.tessellation, self.tessellation)),
             scale=(200, 1, 200),
             material=self.assets.materials['platform'],
             collider='mesh'
@@ -123,7 +128,7 @@ class EnhancedStation(Entity):
             for x in range(width + 1):
                 vertices.append(Vec3(
                     x - width/2,
-                    np.sin(x/10) * 0.1, # Subtle height variation
+                    math.sin(x/10) * 0.1, # Subtle height variation
                     z - height/2
                 ))
         return vertices
@@ -166,17 +171,20 @@ class EnhancedStation(Entity):
 
 class EnhancedGameManager:
     def __init__(self):
-        self.app = Ursina()
+        self.quality = quality.active()
+        self.app = Ursina(**self.quality.window_options())
         window.title = 'Enhanced Railway Station'
-        window.vsync = True
+        if self.quality.fps_counter:
+            window.fps_counter.enabled = True
         
         # Initialize systems
-        self.lighting = AdvancedLightingSystem()
+        self.lighting = AdvancedLightingSystem(self.quality)
         self.assets = EnhancedAssetManager()
-        self.station = EnhancedStation(self.assets, self.lighting)
+        self.station = EnhancedStation(self.assets, self.lighting, self.quality.tessellation)
         
         # Enhanced post-processing
-        self.setup_post_processing()
+        if self.quality.post_processing:
+            self.setup_post_processing()
         
         # Player setup with enhanced camera
         self.setup_player()
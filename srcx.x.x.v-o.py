@@ -1,6 +1,7 @@
 from ursina import *
 from ursina.shaders import lit_with_shadows_shader
 from ursina.prefabs.first_person_controller import FirstPersonController
+import quality
 
 # -----------------------------------------------------------
 # Safe Texture Loading with Color Fallback
@@ -28,13 +29,14 @@ class AdvancedLightingSystem:
     Implements directional light (sun), ambient light,
     and a limit on point lights for performance.
     """
-    def __init__(self):
+    def __init__(self, preset):
+        self.preset = preset
         # Directional 'Sun' light
         self.sun = DirectionalLight(
             y=20,
             rotation=(45, -45, 0),
-            shadows=True,
-            shadow_resolution=2048
+            shadows=preset.shadows,
+            shadow_map_resolution=Vec2(preset.shadow_resolution, preset.shadow_resolution)
         )
         # Ambient Light
         self.ambient = AmbientLight(color=color.rgba(0.3, 0.3, 0.4, 0.5))
@@ -42,16 +44,15 @@ class AdvancedLightingSystem:
         self.point_lights = []
 
     def create_point_light(self, position, color=color.white, intensity=1.0):
-        # Keep only 4 point lights for performance
-        MAX_POINT_LIGHTS = 4
-        if len(self.point_lights) >= MAX_POINT_LIGHTS:
+        # Keep the point light count within the quality preset for performance
+        if len(self.point_lights) >= self.preset.max_point_lights:
             print("Max point lights reached.")
             return None
 
         light = PointLight(
             position=position,
             color=color * intensity,
-            shadows=True
+            shadows=self.preset.shadows
         )
         self.point_lights.append(light)
         return light
@@ -118,17 +119,19 @@ class GameManager:
     Orchestrates the Ursina app, lighting, environment, player, etc.
     """
     def __init__(self):
-        self.app = Ursina()
+        self.quality = quality.active()
+        self.app = Ursina(**self.quality.window_options())
         window.title = "Advanced Ursina Environment"
         # We'll do a quick hack to show how to manually set window size:
-        print("---------------set size to: (1440, 935)")
-        window.size = (1440, 935)
+        size = self.quality.window_size or (1440, 935)
+        print(f"---------------set size to: {size}")
+        window.size = size
         window.borderless = False
         window.exit_button.visible = True
-        window.fps_counter.enabled = True
+        window.fps_counter.enabled = self.quality.fps_counter
 
         # Setup lighting and environment
-        self.lighting = AdvancedLightingSystem()
+        self.lighting = AdvancedLightingSystem(self.quality)
         self.station = EnhancedStation(self.lighting)
 
         # Setup player
@@ -136,7 +139,8 @@ class GameManager:
         self.player.speed = 5
 
         # Use Ursina's shadow shader on camera
-        camera.shader = lit_with_shadows_shader
+        if self.quality.post_processing:
+            camera.shader = lit_with_shadows_shader
 
     def run(self):
         self.app.run()
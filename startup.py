@@ -0,0 +1,78 @@
+import time
+from contextlib import contextmanager
+
+# Imported before Ursina so the import phase itself can be timed
+_script_start = time.perf_counter()
+
+FIRST_FRAME_TARGET = 1.0   # seconds from script start to the first shown frame
+
+
+class StartupProfiler:
+    """
+    Times named startup phases (imports, window, asset load, scene build,
+    shader compile) and when the first frame was shown. Phases with the
+    same name add up, so a phase can be split across several stages.
+    """
+    def __init__(self):
+        self.start = _script_start
+        self.phases = {}
+        self.first_frame = None
+        self.ready = None
+
+    @contextmanager
+    def phase(self, name):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - begin
+
+    def since_start(self):
+        return time.perf_counter() - self.start
+
+    def report(self):
+        lines = ['Startup breakdown (ms):']
+        for name, seconds in self.phases.items():
+            lines.append(f'  {name:<16}{seconds * 1000:>9.1f}')
+        if self.first_frame is not None:
+            over = f'  (over the {FIRST_FRAME_TARGET:g} s target)' if self.first_frame > FIRST_FRAME_TARGET else ''
+            lines.append(f'  {"first frame at":<16}{self.first_frame * 1000:>9.1f}{over}')
+        if self.ready is not None:
+            lines.append(f'  {"scene ready at":<16}{self.ready * 1000:>9.1f}')
+        return '\n'.join(lines)
+
+
+class StagedBuilder:
+    """
+    Runs scene-building stages one per frame, after the frame has been
+    drawn, so the window (and any intro screen) appears before the scene
+    is built behind it. Each stage is a (phase name, function) pair.
+    on_done is called once every stage has run.
+    """
+    def __init__(self, app, profiler, stages, on_done=None):
+        self.profiler = profiler
+        self.stages = list(stages)
+        self.on_done = on_done
+        # Sort above igLoop (50) so the stage runs after this frame is rendered
+        app.taskMgr.add(self.step, 'staged_builder', sort=60)
+
+    def step(self, task):
+        if self.profiler.first_frame is None:
+            self.profiler.first_frame = self.profiler.since_start()
+        if not self.stages:
+            self.profiler.ready = self.profiler.since_start()
+            print(self.profiler.report())
+            if self.on_done:
+                self.on_done()
+            return task.done
+
+        name, build = self.stages.pop(0)
+        with self.profiler.phase(name):
+            build()
+        return task.cont
+
+
+def prepare_scene(app):
+    """Uploads textures, geometry and compiles shaders now rather than on first sight."""
+    if app.win:
+        app.render.prepareScene(app.win.getGsg())
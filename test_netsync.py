@@ -0,0 +1,90 @@
+import netsync
+from netsync import DOOR, PLAYER, TRAIN, decode_snapshot, encode_snapshot, quantize
+
+
+def station_view(train_x=-80.0, door_y=3.5, players=((0.0, 1.0, -10.0),)):
+    view = {1: quantize(TRAIN, train_x, 1.5, 0), 2: quantize(DOOR, 0, door_y, 20)}
+    for i, (x, y, z) in enumerate(players):
+        view[10 + i] = quantize(PLAYER, x, y, z, 90)
+    return view
+
+
+def test_full_snapshot_round_trip():
+    view = station_view()
+    tick, decoded = decode_snapshot(encode_snapshot(5, 0, view, {}), {})
+    assert tick == 5
+    assert decoded == view
+
+
+def test_delta_round_trip_against_baseline():
+    baseline = station_view(players=((0, 1, -10), (5, 1, -5)))
+    view = station_view(train_x=-79.6, door_y=4.0, players=((0, 1, -10),))
+    packet = encode_snapshot(6, 5, view, baseline)
+    full = encode_snapshot(6, 0, view, {})
+    assert len(packet) < len(full)
+
+    tick, decoded = decode_snapshot(packet, {5: baseline})
+    assert tick == 6
+    assert decoded == view          # second player was removed
+
+
+def test_delta_against_unknown_baseline_is_dropped():
+    packet = encode_snapshot(40, 5, station_view(), station_view())
+    assert decode_snapshot(packet, {}) is None
+
+
+def test_server_falls_back_to_full_snapshot_after_baseline_expires():
+    server = netsync.StationServer(port=0)
+    client = netsync.NetClient(*server.address)
+    other = netsync.NetClient(*server.address)
+
+    def exchange(ticks, clients):
+        for _ in range(ticks):
+            for c in clients:
+                c.send_pose(0, 1, -10, 0, force=True)
+            server.step()
+            for c in clients:
+                c.poll()
+
+    try:
+        exchange(5, (client, other))
+        assert other.player_id in client.views[client.latest_tick]
+        slot = server.clients[next(a for a, c in server.clients.items() if c.player_id == client.player_id)]
+        acked = slot.ack_tick
+
+        # A hitch: the client neither polls nor acks for longer than the
+        # history, and the other player leaves meanwhile
+        other.close()
+        for _ in range(netsync.SNAPSHOT_HISTORY * 2):
+            server.step()
+        assert acked not in slot.history
+
+        exchange(3, (client,))
+        assert client.latest_tick == server.tick
+        assert slot.ack_tick > acked
+        assert other.player_id not in client.views[client.latest_tick]
+    finally:
+        client.close()
+        server.sock.close()
+
+
+def test_trains_and_doors_are_sent_outside_the_interest_radius():
+    server = netsync.StationServer(port=0, interest_radius=10)
+    near = netsync.NetClient(*server.address)
+    far = netsync.NetClient(*server.address)
+    try:
+        server.poll()
+        for c in (near, far):
+            c.poll()
+        # Clients spawn at (0, 1, -10), 80 m from the train; move one of them away
+        far_slot = next(c for c in server.clients.values() if c.player_id == far.player_id)
+        server.entities[far_slot.player_id][1] = 60
+        server.step()
+        near.poll()
+
+        kinds = {state[0] for state in near.views[near.latest_tick].values()}
+        assert kinds == {TRAIN, DOOR}   # the far player is culled, the train is not
+    finally:
+        near.close()
+        far.close()
+        server.sock.close()
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+from ursina import Ursina, Vec3, application, mouse
+
+from replay import InputRecorder, InputReplayer, load_log
+
+
+@pytest.fixture(scope='module')
+def app():
+    return Ursina(window_type='none')
+
+
+def record(path, frames):
+    recorder = InputRecorder(str(path))
+    for dt, vx, vy, keys in frames:
+        time.dt = dt
+        mouse.velocity = Vec3(vx, vy, 0)
+        for key in keys:
+            recorder.input(key)
+        recorder.update()
+    recorder.close()
+    recorder.enabled = False
+
+
+FRAMES = [(0.5, 0.25, -0.5, ['w', 'left mouse down']),
+          (0.25, 0.0, 0.0, []),
+          (0.125, -1.0, 2.0, ['w up', 'w'])]
+
+
+def test_log_round_trip(app, tmp_path):
+    record(tmp_path / 'run.hl3r', FRAMES)
+    assert load_log(tmp_path / 'run.hl3r') == FRAMES
+
+
+def test_log_cut_off_inside_a_frame_stops_at_last_complete_frame(app, tmp_path):
+    path = tmp_path / 'run.hl3r'
+    record(path, FRAMES[:2] + [(0.125, 0.0, 0.0, ['new key', 'w'])])
+    data = path.read_bytes()
+    for cut in (4, 1):              # inside the new key's name, then just after it
+        path.write_bytes(data[:-cut])
+        assert load_log(path) == FRAMES[:2]
+
+
+def test_finish_hands_clock_mouse_and_keys_back(app, tmp_path):
+    # Mouse button events need a window, so this log only presses keys
+    frames = [(0.5, 0.25, -0.5, ['w']), (0.25, 0.0, 0.0, ['w up'])]
+    record(tmp_path / 'run.hl3r', frames)
+    replayer = InputReplayer(app, tmp_path / 'run.hl3r', quit_when_done=False)
+    assert not application.calculate_dt
+    assert not app.isAccepting('buttonDown') and not app.isAccepting('raw-w')
+
+    for _ in range(len(frames) + 1):
+        app.taskMgr.step()
+    assert replayer.index == len(frames)
+    assert application.calculate_dt
+    assert 'update' not in vars(mouse)
+    for event in ('buttonDown', 'buttonUp', 'buttonHold', 'keystroke', 'raw-w', 'raw-w-up', 'raw-w-repeat'):
+        assert app.isAccepting(event)
+    assert not app.taskMgr.hasTaskNamed('replay')
@@ -1,11 +1,23 @@
-from ursina import *
-from ursina.prefabs.first_person_controller import FirstPersonController
+from startup import StagedBuilder, StartupProfiler, prepare_scene
+
+profiler = StartupProfiler()
+
+with profiler.phase('imports'):
+    from ursina import *
+    import bvh
+    import quality
+    import replay
 
 # Initialize Ursina App
-app = Ursina()
+with profiler.phase('window'):
+    quality_preset = quality.active()
+    app = Ursina(**quality_preset.window_options())
+    if quality_preset.fps_counter:
+        window.fps_counter.enabled = True
 
 # State Variables
 intro_active = True
+scene_ready = False
 
 # Intro Entities
 intro_background = Entity(
@@ -28,7 +40,7 @@ intro_title = Text(
 
 intro_instructions = Text(
     parent=camera.ui,
-    text='Move with WASD.\nPress "E" to interact.\nPress "Enter" to Start.',
+    text='Move with WASD.\nPress "E" to interact.\nLoading station...',
     origin=(0, 0),
     scale=1.5,
     color=color.white,
@@ -42,82 +54,104 @@ def disable_intro():
     intro_title.disable()
     intro_instructions.disable()
 
-# Environment Setup
-ground = Entity(
-    model='plane',
-    scale=(200, 1, 200),
-    color=color.dark_gray,
-    texture_scale=(100, 100),
-    collider='box'  # Prevent falling through
-)
+# -----------------------------------------------------------
+# Scene Build Stages
+# -----------------------------------------------------------
+# The intro is shown first; the station is built behind it one stage
+# per frame (see StagedBuilder). The globals below are filled in as the
+# stages run, and update() waits for scene_ready.
+ground = walls = player = platforms = benches = lamp_posts = sign = None
+train = npc = door = info_text = raycasts = None
+
+def load_assets():
+    for model_name in ('cube', 'plane', 'cylinder', 'sphere'):
+        load_model(model_name)
+
+def build_environment():
+    global ground, walls
+
+    # Environment Setup
+    ground = Entity(
+        model='plane',
+        scale=(200, 1, 200),
+        color=color.dark_gray,
+        texture_scale=(100, 100),
+        collider='box'  # Prevent falling through
+    )
+
+    # Station Walls using built-in cube model
+    walls = [
+        Entity(model='cube', scale=(1, 10, 200), position=(-100, 5, 0), color=color.white, collider='box'),
+        Entity(model='cube', scale=(1, 10, 200), position=(100, 5, 0), color=color.white, collider='box'),
+        Entity(model='cube', scale=(200, 10, 1), position=(0, 5, 100), color=color.white, collider='box'),
+        Entity(model='cube', scale=(200, 10, 1), position=(0, 5, -100), color=color.white, collider='box')
+    ]
+
+    # Lighting (lights join the scene when created)
+    PointLight(position=(0, 20, 0), color=color.white)
+    AmbientLight(color=color.rgb(100, 100, 100))
+
+def build_player():
+    global player
+    # Imported here so the prefab does not slow down the first frame
+    from ursina.prefabs.first_person_controller import FirstPersonController
+
+    # Player Setup
+    player = FirstPersonController()
+    player.speed = 5
+    player.enabled = False  # Disabled during intro
+
+def build_platforms():
+    global platforms, benches, lamp_posts, sign
 
-# Station Walls using built-in cube model
-walls = [
-    Entity(model='cube', scale=(1, 10, 200), position=(-100, 5, 0), color=color.white, collider='box'),
-    Entity(model='cube', scale=(1, 10, 200), position=(100, 5, 0), color=color.white, collider='box'),
-    Entity(model='cube', scale=(200, 10, 1), position=(0, 5, 100), color=color.white, collider='box'),
-    Entity(model='cube', scale=(200, 10, 1), position=(0, 5, -100), color=color.white, collider='box')
-]
-
-# Lighting
-point_light = PointLight(position=(0, 20, 0), color=color.white)
-ambient_light = AmbientLight(color=color.rgb(100, 100, 100))
-scene.lights.append(point_light)
-scene.lights.append(ambient_light)
-
-# Player Setup
-player = FirstPersonController()
-player.speed = 5
-player.enabled = False  # Disabled during intro
-
-# Platforms with Colliders
-platforms = [
-    Entity(model='cube', scale=(50, 1, 5), position=(-50, 0.5, -20), color=color.gray, collider='box'),
-    Entity(model='cube', scale=(50, 1, 5), position=(50, 0.5, -20), color=color.gray, collider='box')
-]
-
-# Benches
-benches = []
-for i in range(-45, 46, 10):
-    benches.append(Entity(model='cube', scale=(4, 1, 2), position=(i, 1, -20), color=color.brown, collider='box'))
-
-# Lamp Posts
-lamp_posts = []
-for i in range(-45, 46, 15):
-    # Lamp Pole
-    lamp_posts.append(Entity(
-        model='cylinder',
-        scale=(0.2, 5, 0.2),
-        position=(i, 2.5, -18),
+    # Platforms with Colliders
+    platforms = [
+        Entity(model='cube', scale=(50, 1, 5), position=(-50, 0.5, -20), color=color.gray, collider='box'),
+        Entity(model='cube', scale=(50, 1, 5), position=(50, 0.5, -20), color=color.gray, collider='box')
+    ]
+
+    # Benches
+    benches = []
+    for i in range(-45, 46, 10):
+        benches.append(Entity(model='cube', scale=(4, 1, 2), position=(i, 1, -20), color=color.brown, collider='box'))
+
+    # Lamp Posts
+    lamp_posts = []
+    for i in range(-45, 46, 15):
+        # Lamp Pole
+        lamp_posts.append(Entity(
+            model='cylinder',
+            scale=(0.2, 5, 0.2),
+            position=(i, 2.5, -18),
+            color=color.white,
+            collider='box'
+        ))
+        # Lamp Light
+        lamp_posts.append(Entity(
+            model='sphere',
+            scale=(0.5, 0.5, 0.5),
+            position=(i, 5.5, -18),
+            color=color.yellow,
+            collider='box'
+        ))
+
+    # Signage
+    sign = Entity(
+        model='quad',
+        scale=(5, 2, 1),
+        position=(0, 6, -20.25),
         color=color.white,
         collider='box'
-    ))
-    # Lamp Light
-    lamp_posts.append(Entity(
-        model='sphere',
-        scale=(0.5, 0.5, 0.5),
-        position=(i, 5.5, -18),
-        color=color.yellow,
-        collider='box'
-    ))
-
-# Signage
-sign = Entity(
-    model='quad',
-    scale=(5, 2, 1),
-    position=(0, 6, -20.25),
-    color=color.white,
-    collider='box'
-)
-Text(
-    parent=sign,
-    text='British Railway Station',
-    position=(0, 0.3),
-    origin=(0, 0),
-    scale=2,
-    color=color.black,
-    background=True
-)
+    )
+    Text(
+        parent=sign,
+        text='British Railway Station',
+        position=(0, 0.3),
+        origin=(0, 0),
+        scale=2,
+        color=color.black,
+        background=True
+    )
 
 # Train Class with Collision
 class Train(Entity):
@@ -168,45 +202,71 @@ class Train(Entity):
             if self.x > 100:
                 self.x = -100  # Loop back to start position
 
-# Instantiate Train
-train = Train()
+def build_train():
+    global train
+
+    # Instantiate Train
+    train = Train()
+
+    # Train Track with Colliders
+    for i in range(-100, 101, 10):
+        Entity(
+            model='cube',
+            scale=(10, 0.5, 2),
+            position=(i, 0.25, 0),
+            color=color.black,
+            collider='box'
+        )
+
+def build_props():
+    global npc, door, info_text
 
-# Train Track with Colliders
-for i in range(-100, 101, 10):
-    Entity(
+    # NPC with Collider
+    npc = Entity(
         model='cube',
-        scale=(10, 0.5, 2),
-        position=(i, 0.25, 0),
-        color=color.black,
+        scale=(1, 2, 1),
+        color=color.orange,
+        position=(10, 1, -5),
         collider='box'
     )
 
-# NPC with Collider
-npc = Entity(
-    model='cube',
-    scale=(1, 2, 1),
-    color=color.orange,
-    position=(10, 1, -5),
-    collider='box'
-)
+    # Door with Collider
+    door = Entity(
+        model='cube',
+        scale=(3, 7, 1),
+        position=(0, 3.5, 20),
+        color=color.blue,
+        collider='box'
+    )
 
-# Door with Collider
-door = Entity(
-    model='cube',
-    scale=(3, 7, 1),
-    position=(0, 3.5, 20),
-    color=color.blue,
-    collider='box'
-)
+    # HUD
+    info_text = Text(
+        text='Move with WASD. Press "E" to interact.',
+        position=(-0.6, 0.45),
+        origin=(0, 0),
+        scale=1.5,
+        background=True
+    )
 
-# HUD
-info_text = Text(
-    text='Move with WASD. Press "E" to interact.',
-    position=(-0.6, 0.45),
-    origin=(0, 0),
-    scale=1.5,
-    background=True
-)
+def on_scene_ready():
+    global scene_ready, raycasts
+    # Player raycasts through a BVH of the colliders (--no-bvh for ursina.raycast)
+    raycasts = bvh.install_from_argv(dynamic_roots=[player, train, door])
+    # Input Recording / Replay (--record / --replay), created after the
+    # scene so the recorder's update() runs last and both start here
+    replay.install_from_argv(app)
+    scene_ready = True
+    intro_instructions.text = 'Move with WASD.\nPress "E" to interact.\nPress "Enter" to Start.'
+
+StagedBuilder(app, profiler, [
+    ('asset load', load_assets),
+    ('scene build', build_environment),
+    ('scene build', build_player),
+    ('scene build', build_platforms),
+    ('scene build', build_train),
+    ('scene build', build_props),
+    ('shader compile', lambda: prepare_scene(app)),
+], on_done=on_scene_ready)
 
 # Scripted Events
 def open_door():
@@ -219,7 +279,7 @@ def update():
     global intro_active
 
     if intro_active:
-        if held_keys['enter']:
+        if held_keys['enter'] and scene_ready:
             intro_active = False
             disable_intro()
             player.enabled = True  # Enable player control